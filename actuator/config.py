@@ -2,4 +2,6 @@ SENSOR_CODE = "Sensor_code" # Cambiar por el código de su sensor
 AWS_ENDPOINT = 'AWS_ENDPOINT-ats.iot.us-east-1.amazonaws.com' # Cambiar por el endpoint correspondiente
 AWS_CLIENT_ID = 'AWS_CLIENT_ID'   # Cambiar por el nombre de su cliente
 AWS_TOPIC_PUB = 'AWS_TOPIC_PUB' # Cambiar por el tópico de publicación
-AWS_TOPIC_SUB = 'AWS_TOPIC_SUB' # Cambiar por el tópico de suscripción
\ No newline at end of file
+AWS_TOPIC_SUB = 'AWS_TOPIC_SUB' # Cambiar por el tópico de suscripción
+TIMESTAMP_EPOCH = False # True: "datetime" en segundos desde 1970 (UTC) en lugar de fecha y hora local
+AWS_TOPIC_PUB_BIN = '' # Tópico de telemetría binaria (vacío: lecturas en JSON por AWS_TOPIC_PUB)
\ No newline at end of file
@@ -2,4 +2,10 @@ SENSOR_CODE = "Sensor_code" # Cambiar por el código de su sensor
 AWS_ENDPOINT = 'AWS_ENDPOINT-ats.iot.us-east-1.amazonaws.com' # Cambiar por el endpoint correspondiente
 AWS_CLIENT_ID = 'AWS_CLIENT_ID'   # Cambiar por el nombre de su cliente
 AWS_TOPIC_PUB = 'AWS_TOPIC_PUB' # Cambiar por el tópico de publicación
-AWS_TOPIC_SUB = 'AWS_TOPIC_SUB' # Cambiar por el tópico de suscripción
\ No newline at end of file
+AWS_TOPIC_SUB = 'AWS_TOPIC_SUB' # Cambiar por el tópico de suscripción
+TIMESTAMP_EPOCH = False # True: "datetime" en segundos desde 1970 (UTC) en lugar de fecha y hora local
+AWS_TOPIC_PUB_BIN = '' # Tópico de telemetría binaria (vacío: lecturas en JSON por AWS_TOPIC_PUB)
+PZEM_CIRCUITS = () # Un PZEM por circuito: (("pump", 0x01), ("lighting", 0x02), ("ventilation", 0x03)); vacío: un solo PZEM. Hasta 5 circuitos con nombres de hasta 12 caracteres (ver readme)
+LEVEL_BURST = 5 # Lecturas por medición de nivel (se descartan las atípicas)
+LEVEL_AIR_TEMPERATURE = 20 # Temperatura del aire (°C) para la velocidad del sonido
+LEVEL_TANKS = () # Litros por tanque: ((distancia_cm, litros), ...) de menor a mayor distancia, o None; ej: (((5, 20), (45, 0)),) * 6
@@ -0,0 +1,141 @@
+import time
+from array import array
+from machine import Pin
+
+
+class HCSR04Scanner:
+    """
+    Read several HC-SR04 sensors at once.
+    The echo pulses are timed by the echo pin interrupts (rising & falling
+    edge timestamps) instead of busy-waiting on each sensor in turn. The
+    sensors of a group are triggered together; by default the groups are
+    the even and the odd sensors, so neighbouring tanks never ping at the
+    same time (acoustic cross-talk). A sweep takes about one echo timeout
+    per group, and a failed sensor doesn't stop the others.
+    """
+    OK = 0
+    NO_ECHO = 1  # The echo pulse never started (sensor missing or broken)
+    OUT_OF_RANGE = 2  # The echo pulse didn't end before the timeout
+
+    def __init__(self, sensors, groups=None, echo_timeout_us=10000, settle_us=2000):
+        """
+        sensors: (trigger_pin, echo_pin) of each sensor
+        groups: indexes of the sensors triggered together,
+        e.g. ((0, 2, 4), (1, 3, 5)). By default even and odd sensors.
+        echo_timeout_us: Max echo pulse length in microseconds (range limit)
+        settle_us: Wait between groups in microseconds, so the echoes of a
+        group die out before the next one
+        """
+        n = len(sensors)
+        self.echo_timeout_us = echo_timeout_us
+        self.settle_us = settle_us
+        if groups is None:
+            groups = (tuple(range(0, n, 2)), tuple(range(1, n, 2)))
+        self.groups = [g for g in groups if g]
+
+        self.pulse = array("i", [0] * n)  # Echo pulse length (us)
+        self.status = bytearray(n)
+        self._rise = array("i", [0] * n)
+        self._fall = array("i", [0] * n)
+        self._edges = bytearray(n)  # Edges seen since the trigger
+
+        self.triggers = []
+        self.echoes = []
+        for i in range(n):
+            trigger_pin, echo_pin = sensors[i]
+            trigger = Pin(trigger_pin, mode=Pin.OUT, pull=None)
+            trigger.value(0)
+            echo = Pin(echo_pin, mode=Pin.IN, pull=None)
+            handler = self._handler(i)
+            try:
+                echo.irq(handler=handler, trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, hard=True)
+            except TypeError:
+                # Ports without hard interrupts
+                echo.irq(handler=handler, trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING)
+            self.triggers.append(trigger)
+            self.echoes.append(echo)
+
+    def _handler(self, i):
+        """
+        Interrupt handler of the sensor i. The first edge after the
+        trigger is the start of the echo pulse and the second one its end
+        (the pin value could have changed again when a soft interrupt runs).
+        It doesn't allocate memory.
+        """
+        rise = self._rise
+        fall = self._fall
+        edges = self._edges
+
+        def handler(pin):
+            t = time.ticks_us()
+            n = edges[i]
+            if n == 0:
+                rise[i] = t
+            elif n == 1:
+                fall[i] = t
+            if n < 2:
+                edges[i] = n + 1
+
+        return handler
+
+    def scan(self):
+        """
+        Trigger every group and time the echoes.
+        Updates `pulse` and `status` of every sensor.
+        """
+        first = True
+        for group in self.groups:
+            if not first:
+                time.sleep_us(self.settle_us)
+            first = False
+            for i in group:
+                self._edges[i] = 0
+            for i in group:
+                self.triggers[i].value(1)
+            # Send a 10us pulse.
+            time.sleep_us(10)
+            for i in group:
+                self.triggers[i].value(0)
+
+            # The pulse starts after the 8 cycles burst (~0.5ms)
+            start = time.ticks_us()
+            limit = self.echo_timeout_us + 1000
+            while True:
+                done = True
+                for i in group:
+                    if self._edges[i] < 2:
+                        done = False
+                        break
+                if done or time.ticks_diff(time.ticks_us(), start) > limit:
+                    break
+                time.sleep_us(100)
+
+            for i in group:
+                n = self._edges[i]
+                if n == 2:
+                    self.pulse[i] = time.ticks_diff(self._fall[i], self._rise[i])
+                    self.status[i] = self.OK
+                else:
+                    self.pulse[i] = 0
+                    self.status[i] = self.OUT_OF_RANGE if n == 1 else self.NO_ECHO
+
+    def distance_cm(self, i):
+        """
+        Distance of the sensor i in the last scan, in centimeters.
+        It returns a float, or None if the sensor failed (see `status`)
+        """
+        if self.status[i] != self.OK:
+            return None
+        # Divide by 2 (the pulse walk the distance twice) and by 29.1
+        # (the sound speed on air, 343.2 m/s, is 1cm each 29.1us)
+        return (self.pulse[i] / 2) / 29.1
+
+    def errors(self):
+        """
+        Failed sensors in the last scan, as a bit mask (bit i = sensor i)
+        """
+        mask = 0
+        for i in range(len(self.status)):
+            if self.status[i] != self.OK:
+                mask |= 1 << i
+        return mask
@@ -1,4 +1,4 @@
-import ustruct as struct
+from array import array
 import time
 
 
@@ -23,13 +23,38 @@ class PZEM:
     threshold = 0
 
     # Info value [debug, timing]
-    frame = None
+    frame = None  # Last command sent (bytearray, reused)
     crc16 = 0x00
-    rcvFrame = None
+    rcvFrame = None  # Last reply received (bytearray, reused)
+    rcvLen = 0  # Number of byte received in rcvFrame
+    tLast = 0
     status = False
-    readingTime = 0  # Reading & writing time in [ms]
-
-    def __init__(self, uart, addr=0xF8):
+    readingTime = 0  # Request to last reply byte latency in [ms]
+    tStart = 0
+
+    # Register map: name -> (read command, first registry, registry count)
+    # 1) Input registries (cmd = 0x04): measurement & allarm status
+    # 2) Holding registries (cmd = 0x03): allarm threshold & address. They
+    #   only change when written, so their values are cached HOLDING_TTL
+    REGISTERS = {
+        "voltage": (0x04, 0x00, 1),
+        "current": (0x04, 0x01, 2),
+        "power": (0x04, 0x03, 2),
+        "energy": (0x04, 0x05, 2),
+        "frequency": (0x04, 0x07, 1),
+        "power_factor": (0x04, 0x08, 1),
+        "allarm": (0x04, 0x09, 1),
+        "threshold": (0x03, 0x01, 1),
+        "address": (0x03, 0x02, 1),
+    }
+    HOLDING_TTL = 600000  # Holding registries cache time in [ms]
+    measureTime = None  # ticks_ms of the last good measurement
+
+    # Response timing (see Modbus over serial line, 2.5.1.1)
+    RESPONSE_TIMEOUT = 500  # Max wait for the first reply byte in [ms]
+    BAUDRATE = 9600
+
+    def __init__(self, uart, addr=0xF8, probe=True):
         """Create a PZEM class object. It's only require the UART connecton
         (this could depent on your device). The default address 0xF8 is used
         as the general address, this address can be only used in single-slave
@@ -51,6 +76,8 @@ class PZEM:
                         is used as the general address, this address can be
                         only used in single-slave environment and can be used
                         for calibration etc. operation.
+            probe (bool): check the connection by reading the address
+                        (PZEMBus probes its devices by itself)
 
         Exception:
             Address issues(Code 0x01): The address must be between 0x01
@@ -60,7 +87,29 @@ class PZEM:
 
         # set uart & update field
         self.uart = uart
-        self.uart.init(bits=8, parity=None, stop=1, baudrate=9600, timeout=500)
+        self.uart.init(
+            bits=8, parity=None, stop=1, baudrate=self.BAUDRATE, timeout=500
+        )
+
+        # End of frame: 3.5 characters of silence (11 bits per character on
+        # the wire at most), fixed to 1750 us above 19200 baud
+        self.silence_us = max(38500000 // self.BAUDRATE, 1750)
+
+        # Frame buffers, allocated once: command (8 bytes, 4 for the reset
+        # cmd) & reply (maximun 25 bytes). The reply is received in place
+        # through the views of its tails.
+        self.frame = bytearray(8)
+        self._frame4 = memoryview(self.frame)[:4]
+        self.rcvFrame = bytearray(25)
+        self._rcvView = memoryview(self.rcvFrame)
+        self._tails = [self._rcvView[i:] for i in range(25)]
+
+        # Raw registry values & the blocks read with a single request each
+        self.inputRegs = array("H", [0] * 10)
+        self.holdingRegs = array("H", [0] * 3)
+        self.blocks = self.coalesce(self.REGISTERS)
+        self.blockTime = [None] * len(self.blocks)  # Last good read (ms)
+        self.pending = None  # Block waiting for its reply
 
         # chech the address field
         if self.checkAddr(addr=addr):
@@ -75,7 +124,9 @@ class PZEM:
 
         # Check the connection by reading the address and update
         # the default address
-        if self.readAddress():
+        if not probe:
+            pass
+        elif self.readAddress():
             self.status = True
         else:
             raise Exception(
@@ -148,13 +199,97 @@ class PZEM:
         """
         Read the energy values of the PZEM device. This task is performed
         by reading the measurement result. This function must be call every
-        times before get the PZEM values.[Note 0x0a is represented as
-        \n in a standard Python]
+        times before get the PZEM values. The allarm status comes in the
+        same request; the allarm threshold & the address are read again
+        only once their cache expires.
+
+        Returns:
+            (bool): return true if the values are correctly read.
+        """
+        ok = True
+        for i in range(len(self.blocks)):
+            if not self.due(i):
+                continue
+            self.request(i)
+            self.readResponse(self.replyLength(i))
+            if not self.finish() and self.blocks[i][0] == 0x04:
+                ok = False
+        return ok
+
+    def coalesce(self, registers):
+        """Group registries in the fewest read requests: registries of the
+        same command that are adjacent (or overlap) are read together.
+
+        Args:
+            registers (iterable): names of the registries (see REGISTERS)
+
+        Returns:
+            (list): (cmd, first registry, registry count) of each request
+        """
+        spans = sorted(self.REGISTERS[name] for name in registers)
+        blocks = []
+        for cmd, first, count in spans:
+            if blocks and blocks[-1][0] == cmd:
+                last = blocks[-1]
+                end = last[1] + last[2]
+                if first <= end:
+                    blocks[-1] = (cmd, last[1], max(end, first + count) - last[1])
+                    continue
+            blocks.append((cmd, first, count))
+        return blocks
+
+    def due(self, i):
+        """
+        Returns:
+            (bool): return true if the block i must be read (measurement
+                    blocks always, holding blocks when their cache expired)
+        """
+        if self.blocks[i][0] == 0x04 or self.blockTime[i] is None:
+            return True
+        return time.ticks_diff(time.ticks_ms(), self.blockTime[i]) >= self.HOLDING_TTL
+
+    def nextBlock(self):
+        """
+        Returns:
+            (int): index of the next block to read: an expired holding block
+                    if any, otherwise the measurement block
+        """
+        live = 0
+        for i in range(len(self.blocks)):
+            if self.blocks[i][0] == 0x04:
+                live = i
+            elif self.due(i):
+                return i
+        return live
+
+    def replyLength(self, i):
+        """
+        Returns:
+            (int): number of byte of the reply to the block i
+                    (addr, cmd, byte count, 2 byte each registry, 2 CRC)
+        """
+        return 5 + 2 * self.blocks[i][2]
+
+    def request(self, i):
+        """Send the read request of the block i, without waiting"""
+        cmd, first, count = self.blocks[i]
+        self.pending = i
+        self.writeCommand(cmd=cmd, regAddr=first, opt=count)
+
+    def finish(self):
+        """Check the reply of the pending block (see request)
 
         Returns:
             (bool): return true if the values are correctly read.
         """
-        return self.sendCommand(cmd=0x04, regAddr=0x00, opt=0x0A, buf=25)
+        i = self.pending
+        self.pending = None
+        if not self.checkReply(regAddr=self.blocks[i][1], buf=self.replyLength(i)):
+            return False
+        self.blockTime[i] = time.ticks_ms()
+        if self.blocks[i][0] == 0x04:
+            self.measureTime = self.blockTime[i]
+        return True
 
     def resetEnergy(self):
         """Reset energy count.
@@ -207,50 +342,120 @@ class PZEM:
         Returns:
             (bool): reding status
         """
+        self.writeCommand(cmd=cmd, regAddr=regAddr, opt=opt)
 
-        # Start writing time (ms)
-        tStart = time.ticks_ms()
+        # Read the response, maximun 25 bytes
+        # (25 bytes = (2 * 10 + 1 + 1 + 1 ) + 2 CRC )
+        self.readResponse(buf)
+        return self.checkReply(regAddr=regAddr, buf=buf)
+
+    def writeCommand(self, cmd=0x04, regAddr=None, opt=None):
+        """Build the command frame in self.frame & send it to the PZEM
+        device, without waiting for the response (see sendCommand)
 
-        # Start to build hex string command
-        # (> = big endian formst)
-        # (B = Unsigned char, 1 byte)
-        # (H = Unsigned short, 2 byte)
-        # [BBhh = 6 bytes]
+        Args:
+            cmd       (byte): Command to send (0x03, 0x04, 0x06)
+            regAddr   (byte): Start reading register low byte address
+            opt       (byte): Number of register to read (or the value
+                            for set the register)
+        """
+        frame = self.frame
+
+        # Build the command in place (big endian registry & value)
+        # [addr, cmd, reg_h, reg_l, opt_h, opt_l] + 2 CRC
+        frame[0] = self.addr
+        frame[1] = cmd
         if cmd == 0x42:  # Reset the energy cmd
-            self.frame = struct.pack(">BB", self.addr, cmd)
+            n = 2
         else:
-            self.frame = struct.pack(">BBHH", self.addr, cmd, regAddr, opt)
+            frame[2] = regAddr >> 8 & 0xFF
+            frame[3] = regAddr & 0xFF
+            frame[4] = opt >> 8 & 0xFF
+            frame[5] = opt & 0xFF
+            n = 6
+
+        # Compute the CRC of frame (2 bytes (low & high))
+        self.crc16 = self.getCRC16(frame, n)
+        frame[n] = self.crc16 & 0xFF
+        frame[n + 1] = self.crc16 >> 8 & 0xFF
+
+        # Drop any stale byte left by a previous (late or broken) reply
+        while self.uart.any():
+            self.uart.readinto(self.rcvFrame)
+        self.rcvLen = 0
+
+        # Send frame to the UART port & start timing (ms)
+        self.tStart = time.ticks_ms()
+        self.uart.write(self._frame4 if n == 2 else frame)
+
+    def receive(self, buf=25, timeout=None):
+        """Move the reply bytes already received by the UART to
+        self.rcvFrame, without waiting.
 
-        # Compute the CRC of frame (2 bytes (high & low))
-        self.crc16 = self.getCRC16(self.frame)
-        crc_h = self.crc16 >> 8 & 0xFF
-        crc_l = self.crc16 & 0xFF
+        Args:
+            buf     (int): Number of byte expected in the reply message
+            timeout (int): Max wait for the first byte in [ms]
+                        (default RESPONSE_TIMEOUT)
 
-        # Add crc to frame obj
-        if cmd == 0x42:
-            self.frame = struct.pack(">BBBB", self.addr, cmd, crc_l, crc_h)
-        else:
-            self.frame = struct.pack(
-                ">BBHHBB", self.addr, cmd, regAddr, opt, crc_l, crc_h
-            )
+        Returns:
+            (bool): return true if the reply is complete, if the line
+                    stays silent for 3.5 characters after the last byte
+                    (end of a shorter frame, e.g. an exception reply) or
+                    if no byte arrived within the timeout
+        """
+        got = self.rcvLen
+        n = self.uart.any()
+        if n:
+            n = self.uart.readinto(self._tails[got], min(n, buf - got))
+            if n:
+                self.rcvLen = got + n
+                self.tLast = time.ticks_us()
+            return self.rcvLen >= buf
+        if got:
+            return time.ticks_diff(time.ticks_us(), self.tLast) > self.silence_us
+        if timeout is None:
+            timeout = self.RESPONSE_TIMEOUT
+        return time.ticks_diff(time.ticks_ms(), self.tStart) > timeout
+
+    def readResponse(self, buf):
+        """Read a reply frame from the UART. Return as soon as the expected
+        bytes arrive or the reply ends (see receive).
 
-        # Send frame to the UART port
-        self.uart.write(self.frame)
-        time.sleep(1)
+        Args:
+            buf (int): number of byte expected in the reply message
 
-        # Read the response, maximun 25 bytes
-        # (25 bytes = (2 * 10 + 1 + 1 + 1 ) + 2 CRC )
-        self.rcvFrame = self.uart.read(buf)
+        Returns:
+            (int): number of byte received in self.rcvFrame (could be
+                    less than buf or zero)
+        """
+        while not self.receive(buf):
+            time.sleep_us(200)
+        return self.rcvLen
+
+    def checkReply(self, regAddr=None, buf=25):
+        """Check the received message (self.rcvFrame) & update the values
+
+        Args:
+            regAddr   (byte): Start register of the command sent
+            buf       (int) : Number of byte expected in the reply message
+
+        Returns:
+            (bool): reding status
+        """
 
         # Update reading time
-        self.readingTime = time.ticks_ms() - tStart
+        self.readingTime = time.ticks_diff(time.ticks_ms(), self.tStart)
 
-        frame = list(self.rcvFrame)
+        frame = self.rcvFrame
+
+        # Shortest valid reply is the reset echo (addr, cmd, 2 CRC)
+        if self.rcvLen < 4:
+            return False
 
         if (
-            self.checkCRC16(frame)
+            self.checkCRC16(self._rcvView, self.rcvLen)
             and self.checkResponse(frame)
-            and len(frame) == (buf - 2)
+            and self.rcvLen == buf
             and self.updateValue(frame=frame, reg=regAddr)
         ):
             return True
@@ -259,35 +464,41 @@ class PZEM:
             # self.errorCode = frame[2];
             return False
 
-    def getCRC16(self, frame):
+    def getCRC16(self, frame, n=None):
         """Compute the cyclic redundancy check (CRC).
 
         Args:
             frame (byte): sequence of byte to inclose
+            n     (int) : number of byte to inclose (default all)
 
         Returns:
             (int): CRC code (16 bit - 2 byte)
         """
+        if n is None:
+            n = len(frame)
+        table = self.table
         crc = 0xFFFF
-        for ch in frame:
-            crc = (crc >> 8) ^ self.table[(crc ^ ch) & 0xFF]
+        for i in range(n):
+            crc = (crc >> 8) ^ table[(crc ^ frame[i]) & 0xFF]
         return crc
 
-    def checkCRC16(self, frame):
+    def checkCRC16(self, frame, n=None):
         """Check the checksum of a received messages
 
         Args:
-            frame (list if int): list of integer received in the message
+            frame (bytearray, memoryview): received message
+            n     (int) : length of the message, CRC included
+                        (default all)
 
         Returns:
             (bool): return true if the checksum are correct
         """
-        CRC_high = frame.pop()
-        CRC_low = frame.pop()
+        if n is None:
+            n = len(frame)
 
-        # Check CRC
-        crc = self.getCRC16(frame)
-        return (CRC_high << 8 | CRC_low) == crc
+        # Check CRC (low byte first)
+        crc = self.getCRC16(frame, n - 2)
+        return (frame[n - 1] << 8 | frame[n - 2]) == crc
 
     def checkResponse(self, frame):
         """Check the message reply
@@ -304,39 +515,43 @@ class PZEM:
         """Update the measurement result after self.read() function is called.
 
         Args:
-            frame (list of byte): list of received byte
+            frame (bytearray): received message
 
         Returns:
             (bool): return true if the values are correctly update
         """
 
         try:
+            # Store the registries read (input registry, cmd = 0x04 or
+            # holding registry, cmd = 0x03), 2 bytes each (big endian)
+            if frame[1] == 0x04 or frame[1] == 0x03:
+                regs = self.inputRegs if frame[1] == 0x04 else self.holdingRegs
+                count = frame[2] >> 1
+                for i in range(count):
+                    regs[reg + i] = frame[3 + 2 * i] << 8 | frame[4 + 2 * i]
+
             # Update the measurement value (input registry, cmd = 0x04)
+            # (32 bits values: low registry first)
             if frame[1] == 0x04:
-
-                self.Voltage = (frame[3] << 8 | frame[4]) / 10
-                self.Current = (
-                    frame[5] << 8 | frame[6] | frame[7] << 24 | frame[8] << 16
-                ) / 1000
-                self.ActivePower = (
-                    frame[9] << 8 | frame[10] | frame[11] << 24 | frame[12] << 16
-                ) / 10
-                self.ActiveEnergy = (
-                    frame[13] << 8 | frame[14] | frame[15] << 24 | frame[16] << 16
-                )
-                self.Frequency = (frame[17] << 8 | frame[18]) / 10
-                self.PowerFactor = (frame[19] << 8 | frame[20]) / 100
-                self.Allarms = frame[21] << 8 | frame[22]
-
-            # Read the allarm threshold value
-            # (holding registry = 0x0001, cmd = 0x03)
-            elif frame[1] == 0x03 and reg == 0x01:
-                self.threshold = frame[3] << 8 | frame[4]
-
-            # Read the Modbus-RTU address
-            # (holding registry = 0x0002, cmd = 0x03)
-            elif frame[1] == 0x03 and reg == 0x02:
-                self.addr = frame[4]
+                r = self.inputRegs
+                self.Voltage = r[0] / 10
+                self.Current = (r[1] | r[2] << 16) / 1000
+                self.ActivePower = (r[3] | r[4] << 16) / 10
+                self.ActiveEnergy = r[5] | r[6] << 16
+                self.Frequency = r[7] / 10
+                self.PowerFactor = r[8] / 100
+                self.Allarms = r[9]
+
+            elif frame[1] == 0x03:
+                # Read the allarm threshold value
+                # (holding registry = 0x0001)
+                if reg <= 0x01 < reg + count:
+                    self.threshold = self.holdingRegs[1]
+
+                # Read the Modbus-RTU address
+                # (holding registry = 0x0002)
+                if reg <= 0x02 < reg + count:
+                    self.addr = self.holdingRegs[2] & 0xFF
 
             # Update the allarm threshold value
             # (holding registry 0x0001, cmd = 0x06)
@@ -0,0 +1,181 @@
+import time
+from lib.pzem import PZEM
+
+
+class Circuit:
+    """One metered circuit: its name, its PZEM & the state of its readings"""
+
+    def __init__(self, name, addr, pzem):
+        self.name = name
+        self.addr = addr
+        self.pzem = pzem
+        self.keys = (
+            name.encode() + b"_current",
+            name.encode() + b"_power",
+            name.encode() + b"_energy",
+            name.encode() + b"_power_factor",
+            name.encode() + b"_alarm",
+            name.encode() + b"_power_threshold",
+        )
+        self.fails = 0  # Consecutive failed readings
+        self.retryTime = 0  # ticks_ms of the last try once offline
+
+    def fresh(self, now, maxAge):
+        """
+        Returns:
+            (bool): return true if the last good reading is recent
+        """
+        t = self.pzem.measureTime
+        return t is not None and time.ticks_diff(now, t) < maxAge
+
+
+class PZEMBus:
+    """Poll several PZEM-004T meters sharing one UART (Modbus-RTU bus).
+
+    Each meter needs its own slave address (see PZEM.setAddress). The bus
+    never waits for a reply: poll() must be called periodically (every
+    POLL_INTERVAL ms). It checks the reply of the pending request and, as
+    soon as it is complete, sends the request for the next meter, so the
+    line is kept busy round-robin while the rest of the node keeps running.
+    write() puts the last readings of every circuit in one message.
+    """
+
+    POLL_INTERVAL = 10  # Suggested poll() period in [ms]
+    TIMEOUT = 100  # Max wait for a reply in [ms]
+    MAX_AGE = 5000  # Older readings are reported as null in [ms]
+    MAX_FAILS = 3  # Failed readings before the meter is taken as offline
+    RETRY = 10000  # Offline meters are retried every RETRY [ms]
+    GENERAL_ADDR = 0xF8
+
+    def __init__(self, uart, circuits):
+        """Create the bus with the circuits to meter. Any circuit whose
+        address does not answer is given one by discover().
+
+        Args:
+            uart     (UART)  : uart object shared by all the PZEM devices
+            circuits (tuple) : (name, address) of each circuit,
+                            e.g. (("pump", 0x01), ("lighting", 0x02))
+        """
+        self.uart = uart
+        self.circuits = []
+        for name, addr in circuits:
+            self.circuits.append(Circuit(name, addr, PZEM(uart, addr, probe=False)))
+        self.discover()
+        self._next = 0
+        self._current = None  # Circuit waiting for a reply
+
+    def discover(self):
+        """Probe the address of every circuit. If some are missing and a
+        single meter answers the general address with an unknown address,
+        it's given the first missing one: new meters can be added to the
+        bus one at a time (rebooting the node after each one).
+
+        Returns:
+            (int): number of circuits that answered
+        """
+        missing = []
+        for c in self.circuits:
+            if c.pzem.readAddress():
+                c.pzem.status = True
+            else:
+                missing.append(c)
+                print("PZEM {} (0x{:02X}) no responde".format(c.name, c.addr))
+        if missing:
+            probe = PZEM(self.uart, self.GENERAL_ADDR, probe=False)
+            known = [c.addr for c in self.circuits]
+            if probe.readAddress() and probe.addr not in known:
+                c = missing.pop(0)
+                if probe.setAddress(c.addr):
+                    c.pzem.status = True
+                    print("PZEM 0x{:02X} asignado a {}".format(c.addr, c.name))
+        return len(self.circuits) - len(missing)
+
+    def poll(self):
+        """Check the pending reply & send the next request (never blocks)"""
+        c = self._current
+        if c is not None:
+            m = c.pzem
+            if not m.receive(buf=m.replyLength(m.pending), timeout=self.TIMEOUT):
+                return
+            if m.finish():
+                c.fails = 0
+            else:
+                c.fails += 1
+                c.retryTime = time.ticks_ms()
+            self._current = None
+
+        # Next circuit, skipping the offline ones until their retry time
+        now = time.ticks_ms()
+        for _ in range(len(self.circuits)):
+            c = self.circuits[self._next]
+            self._next = (self._next + 1) % len(self.circuits)
+            if (
+                c.fails < self.MAX_FAILS
+                or time.ticks_diff(now, c.retryTime) >= self.RETRY
+            ):
+                self._current = c
+                c.pzem.request(c.pzem.nextBlock())
+                return
+
+    def write(self, p):
+        """Write the readings of every circuit & the totals of the bus.
+        Per circuit: <name>_current, <name>_power, <name>_energy and
+        <name>_power_factor, <name>_alarm & <name>_power_threshold (null if
+        its reading is too old). Bus: voltage, frecuency, and current, power,
+        energy, power_factor & alarm for all the circuits together (null if
+        no circuit has a reading). Every field is always written, so the
+        message has the same keys on every call & the node can size its
+        buffers from a single reading.
+
+        Args:
+            p (Payload): message being built (see core/payload.py)
+
+        Returns:
+            (bool): return true if at least one circuit has a reading
+        """
+        now = time.ticks_ms()
+        voltage = None
+        frequency = None
+        current = 0
+        power = 0
+        energy = 0
+        apparent = 0
+        alarm = 0
+        for c in self.circuits:
+            keys = c.keys
+            if not c.fresh(now, self.MAX_AGE):
+                p.num(keys[0], None, 2)
+                p.num(keys[1], None, 2)
+                p.num(keys[2], None, 0)
+                p.num(keys[3], None, 2)
+                p.num(keys[4], None, 0)
+                p.num(keys[5], None, 0)
+                continue
+            m = c.pzem
+            p.num(keys[0], m.Current, 2)
+            p.num(keys[1], m.ActivePower, 2)
+            p.num(keys[2], m.ActiveEnergy, 0)
+            p.num(keys[3], m.PowerFactor, 2)
+            p.num(keys[4], 1 if m.Allarms else 0, 0)
+            p.num(keys[5], m.threshold, 0)
+            if voltage is None:
+                voltage = m.Voltage
+                frequency = m.Frequency
+            current += m.Current
+            power += m.ActivePower
+            energy += m.ActiveEnergy
+            apparent += m.Voltage * m.Current
+            if m.Allarms:
+                alarm = 1
+        if voltage is None:
+            current = power = energy = alarm = factor = None
+        else:
+            factor = power / apparent if apparent else 0
+        p.num(b"voltage", voltage, 2)
+        p.num(b"current", current, 2)
+        p.num(b"power", power, 2)
+        p.num(b"energy", energy, 0)
+        p.num(b"frecuency", frequency, 2)
+        p.num(b"power_factor", factor, 2)
+        p.num(b"alarm", alarm, 0)
+        return voltage is not None
@@ -0,0 +1,142 @@
+import time
+import math
+from array import array
+
+
+class LevelEstimator:
+    """
+    Stable tank levels from an HCSR04Scanner.
+    Each reading takes a burst of scans and, for every sensor, rejects the
+    outliers with a median/MAD filter and averages the rest. The distance
+    uses the speed of sound at the air temperature, and a per-tank table
+    converts it to litres.
+    """
+    MAD_K = 3  # Samples farther than MAD_K robust deviations are outliers
+    MIN_SPREAD_US = 6  # Tolerance when MAD is 0 (~1mm)
+
+    def __init__(self, scanner, burst=5, gap_ms=10, temperature=20, tanks=None):
+        """
+        scanner: HCSR04Scanner with the tank sensors
+        burst: Scans per reading
+        gap_ms: Wait between scans in milliseconds
+        temperature: Air temperature in Celsius (see `set_temperature`)
+        tanks: Geometry of each tank: ((distance_cm, litres), ...) sorted
+        by distance, or None for a tank without table. The volume is
+        interpolated between the points of its table.
+        """
+        self.scanner = scanner
+        n = len(scanner.status)
+        self.burst = burst
+        self.gap_ms = gap_ms
+        self.tanks = tanks or ()
+        self.set_temperature(temperature)
+
+        self.distance = [None] * n  # Filtered distance (cm)
+        self.litres = [None] * n
+        self._samples = [array("i", [0] * burst) for _ in range(n)]
+        self._count = bytearray(n)
+        self._dev = array("f", [0] * burst)
+
+    def set_temperature(self, celsius):
+        """
+        Air temperature, from config or from a co-located sensor.
+        Sound speed: 331.3 * sqrt(1 + T / 273.15) m/s
+        """
+        self.temperature = celsius
+        speed = 331.3 * math.sqrt(1 + celsius / 273.15)  # m/s
+        # The pulse walk the distance twice: cm per microsecond of echo
+        self._cm_per_us = speed / 2 / 10000
+
+    def read(self):
+        """
+        Take a burst of scans and update `distance` and `litres`.
+        A sensor with less than half of the burst valid reads None.
+        """
+        scanner = self.scanner
+        n = len(self._count)
+        for i in range(n):
+            self._count[i] = 0
+        for k in range(self.burst):
+            if k:
+                time.sleep_ms(self.gap_ms)
+            scanner.scan()
+            for i in range(n):
+                if scanner.status[i] == scanner.OK:
+                    c = self._count[i]
+                    self._samples[i][c] = scanner.pulse[i]
+                    self._count[i] = c + 1
+
+        for i in range(n):
+            pulse = None
+            if self._count[i] * 2 > self.burst:
+                pulse = self._filter(self._samples[i], self._count[i])
+            if pulse is None:
+                self.distance[i] = None
+                self.litres[i] = None
+                continue
+            cm = pulse * self._cm_per_us
+            self.distance[i] = cm
+            table = self.tanks[i] if i < len(self.tanks) else None
+            self.litres[i] = self._volume(table, cm) if table else None
+
+    def errors(self):
+        """
+        Sensors without a valid reading, as a bit mask (bit i = sensor i)
+        """
+        mask = 0
+        for i in range(len(self.distance)):
+            if self.distance[i] is None:
+                mask |= 1 << i
+        return mask
+
+    def _filter(self, samples, n):
+        """
+        Mean of the samples within MAD_K robust deviations of the median
+        (1.4826 * MAD estimates the standard deviation). It sorts the
+        samples in place and doesn't allocate arrays.
+        """
+        _sort(samples, n)
+        med = _median(samples, n)
+        dev = self._dev
+        for j in range(n):
+            dev[j] = abs(samples[j] - med)
+        _sort(dev, n)
+        limit = max(self.MAD_K * 1.4826 * _median(dev, n), self.MIN_SPREAD_US)
+        total = 0
+        used = 0
+        for j in range(n):
+            if abs(samples[j] - med) <= limit:
+                total += samples[j]
+                used += 1
+        return total / used if used else None
+
+    def _volume(self, table, cm):
+        """
+        Litres at the distance `cm`, interpolated in the tank table
+        (clamped to its first and last points)
+        """
+        if cm <= table[0][0]:
+            return table[0][1]
+        for j in range(1, len(table)):
+            d1, v1 = table[j]
+            if cm <= d1:
+                d0, v0 = table[j - 1]
+                return v0 + (v1 - v0) * (cm - d0) / (d1 - d0)
+        return table[-1][1]
+
+
+def _sort(a, n):
+    # Insertion sort of the first n items (the bursts are small)
+    for j in range(1, n):
+        x = a[j]
+        k = j - 1
+        while k >= 0 and a[k] > x:
+            a[k + 1] = a[k]
+            k -= 1
+        a[k + 1] = x
+
+
+def _median(a, n):
+    # Median of the first n items, already sorted
+    m = n // 2
+    return a[m] if n % 2 else (a[m - 1] + a[m]) / 2
@@ -0,0 +1 @@
+# Firmware común de los nodos EnviroSense (ver core/node.py)
@@ -0,0 +1,149 @@
+from array import array
+import math
+
+MAX_FIELDS = 64  # Campos distintos por nodo
+
+
+class Aggregator:
+    """
+    Estadísticas por ventana de reporte, en memoria fija.
+
+    Con el muestreo rápido activado los drivers escriben cada muestra aquí,
+    con la misma interfaz que Payload (begin, mark/rewind, num), y commit()
+    la suma a la ventana. Para los campos de `keys` se lleva cantidad,
+    mínimo, máximo, media y varianza (Welford, sin guardar las muestras);
+    de los demás sólo el último valor. Al cerrar la ventana emit() escribe
+    el resumen en el Payload de la publicación: la media con la clave del
+    campo, para no cambiar la forma del mensaje, y además <clave>_min,
+    <clave>_max, <clave>_std y la cantidad de muestras en "samples".
+
+    Node dimensiona el Payload contando estos campos (ver SizeEstimate en
+    core/payload.py); si aun así un campo no entra, emit() lo descarta y lo
+    informa. Más de MAX_FIELDS campos distintos es un error.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys  # Campos con estadísticas (bytes)
+        self._index = {}  # clave -> posición
+        self._names = []  # (clave, _min, _max, _std) o (clave,)
+        self._decimals = []
+        self._stage = [None] * MAX_FIELDS  # Valores de la muestra en curso
+        self._last = [None] * MAX_FIELDS
+        self._count = array("I", [0] * MAX_FIELDS)
+        self._mean = array("f", [0] * MAX_FIELDS)
+        self._m2 = array("f", [0] * MAX_FIELDS)
+        self._min = array("f", [0] * MAX_FIELDS)
+        self._max = array("f", [0] * MAX_FIELDS)
+        self._touched = bytearray(MAX_FIELDS)  # Campos escritos en la muestra en curso
+        self._order = bytearray(MAX_FIELDS)  # ... en el orden en que se escribieron
+        self._n = 0
+        self._seen = bytearray(MAX_FIELDS)  # Campos escritos en la ventana
+        self.samples = 0
+
+    def _register(self, key, decimals):
+        i = len(self._names)
+        if i == MAX_FIELDS:
+            raise ValueError("Más de {} campos para agregar".format(MAX_FIELDS))
+        if key in self.keys:
+            self._names.append((key, key + b"_min", key + b"_max", key + b"_std"))
+        else:
+            self._names.append((key,))
+        self._decimals.append(decimals)
+        self._index[key] = i
+        return i
+
+    # Comienza una muestra
+    def begin(self):
+        self.rewind(0)
+
+    # Posición actual, para descartar los campos de un driver con error
+    def mark(self):
+        return self._n
+
+    def rewind(self, mark):
+        while self._n > mark:
+            self._n -= 1
+            self._touched[self._order[self._n]] = 0
+
+    def num(self, key, value, decimals=2):
+        i = self._index.get(key)
+        if i is None:
+            i = self._register(key, decimals)
+        self._stage[i] = value
+        if not self._touched[i]:
+            self._touched[i] = 1
+            self._order[self._n] = i
+            self._n += 1
+
+    def text(self, key, value):
+        pass
+
+    # Suma la muestra en curso a la ventana
+    def commit(self):
+        for k in range(self._n):
+            i = self._order[k]
+            self._seen[i] = 1
+            x = self._stage[i]
+            self._last[i] = x
+            if x is None or len(self._names[i]) == 1:
+                continue
+            n = self._count[i] + 1
+            self._count[i] = n
+            if n == 1:
+                self._mean[i] = x
+                self._m2[i] = 0
+                self._min[i] = x
+                self._max[i] = x
+            else:
+                mean = self._mean[i]
+                d = x - mean
+                mean += d / n
+                self._mean[i] = mean
+                self._m2[i] += d * (x - mean)
+                if x < self._min[i]:
+                    self._min[i] = x
+                elif x > self._max[i]:
+                    self._max[i] = x
+        self.begin()
+        self.samples += 1
+
+    # Escribe el resumen de la ventana en p y empieza una ventana nueva. Un
+    # campo que no entra en el mensaje se descarta completo.
+    def emit(self, p):
+        dropped = 0
+        for i in range(len(self._names)):
+            if not self._seen[i]:
+                continue
+            start = p.mark()
+            try:
+                self._emit_field(p, i)
+            except ValueError:
+                p.rewind(start)
+                dropped += 1
+        start = p.mark()
+        try:
+            p.num(b"samples", self.samples, 0)
+        except ValueError:
+            p.rewind(start)
+            dropped += 1
+        if dropped:
+            print("Resumen sin", dropped, "campos: no entran en el mensaje")
+        self.reset()
+
+    def _emit_field(self, p, i):
+        names = self._names[i]
+        decimals = self._decimals[i]
+        n = self._count[i]
+        if len(names) == 1 or n == 0:
+            p.num(names[0], self._last[i], decimals)
+            return
+        p.num(names[0], self._mean[i], decimals)
+        p.num(names[1], self._min[i], decimals)
+        p.num(names[2], self._max[i], decimals)
+        p.num(names[3], math.sqrt(max(self._m2[i], 0) / (n - 1)) if n > 1 else 0, decimals)
+
+    def reset(self):
+        for i in range(len(self._names)):
+            self._count[i] = 0
+            self._seen[i] = 0
+        self.samples = 0
@@ -0,0 +1,347 @@
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+import errno
+import select
+import socket
+import time
+from . import simple
+
+# Parser states
+_ST_OP = 0  # Waiting for the fixed header byte
+_ST_LEN = 1  # Decoding the variable "remaining length"
+_ST_BODY = 2  # Copying the packet body
+
+_ETIMEDOUT = 110
+
+
+class MQTTClient(simple.MQTTClient):
+    """Event-driven MQTT client for uasyncio.
+
+    Reuses the packet logic of simple.MQTTClient (connect, subscribe and
+    publish) but, once started, inbound traffic is read by the run() task:
+    it awaits socket readiness and feeds whatever bytes arrived into an
+    incremental parser, so the subscription callback fires as soon as a
+    packet is complete and nothing is polled while the link is idle.
+
+    run() also keeps the session alive: it reconnects with exponential
+    backoff (awaiting the TCP connection, so only the TLS handshake and
+    CONNACK block the loop, for at most HANDSHAKE_TIMEOUT) and sends a
+    PINGREQ every keepalive/2 seconds, dropping the link when the previous
+    one got no answer.
+    """
+
+    DELAY = 1  # Seconds before the first reconnection attempt, doubled after each failure
+    MAX_DELAY = 60  # Longest wait between reconnection attempts in seconds
+    DEBUG = False
+    CONNECT_TIMEOUT = 10  # Seconds for the TCP connection (awaited, not blocking)
+    HANDSHAKE_TIMEOUT = 5  # Seconds for the blocking TLS handshake, CONNACK and SUBACK
+    CONNECT_POLL = 50  # Milliseconds between checks of a pending TCP connection
+    WRITE_TIMEOUT = 5000  # Milliseconds to wait for room in the send buffer
+    RBUF_SIZE = 256  # Bytes read from the socket at once
+    MAX_PACKET = 4096  # Largest inbound packet body accepted
+    WINDOW_POLL = 20  # Milliseconds between checks for room in the window
+    WINDOW_TIMEOUT = 10000  # Milliseconds apublish() waits for room in the window
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_connect = None  # Called after every successful reconnect
+        self.link_up = None  # Optional callable: False skips reconnection attempts (no Wi-Fi)
+        self._topics = []  # Subscriptions restored on reconnect
+        self._reader = None
+        self._poller = None
+        self._rbuf = bytearray(self.RBUF_SIZE)
+        self._rmv = memoryview(self._rbuf)
+        self._body = bytearray(64)
+        self._rx_at = 0  # ticks_ms of the last inbound bytes
+        self._ping_at = None  # ticks_ms of the last PINGREQ
+        self._reset_parser()
+
+    def log(self, in_reconnect, e):
+        if self.DEBUG:
+            if in_reconnect:
+                print("mqtt reconnect: %r" % e)
+            else:
+                print("mqtt: %r" % e)
+
+    def _reset_parser(self):
+        self._st = _ST_OP
+        self._op = 0
+        self._rlen = 0
+        self._sh = 0
+        self._pos = 0
+
+    def connect(self, clean_session=True, timeout=None):
+        # The handshake (CONNACK, SUBACK) runs on a blocking socket; run()
+        # switches it to non-blocking once the session is established.
+        self._reader = None
+        return super().connect(clean_session, timeout)
+
+    def subscribe(self, topic, qos=0):
+        super().subscribe(topic, qos)
+        self.add_subscription(topic, qos)
+
+    def add_subscription(self, topic, qos=0):
+        """Record a subscription to be (re)established on every reconnect."""
+        for t, _ in self._topics:
+            if t == topic:
+                return
+        self._topics.append((topic, qos))
+
+    def is_connected(self):
+        """True while the session is up and run() is receiving."""
+        return self._reader is not None
+
+    def _attach(self):
+        self.sock.setblocking(False)
+        self._poller = select.poll()
+        self._poller.register(self.sock, select.POLLOUT)
+        self._reader = asyncio.StreamReader(self.sock)
+        self._rx_at = time.ticks_ms()
+        self._ping_at = None
+        self._reset_parser()
+
+    def _close(self):
+        self._reader = None
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+    def _write(self, buf, n=None):
+        if self._reader is None:
+            # Still in the blocking handshake
+            return super()._write(buf, n)
+        mv = memoryview(buf)
+        if n is not None:
+            mv = mv[:n]
+        while mv:
+            w = self.sock.write(mv)
+            if w:
+                mv = mv[w:]
+            elif not self._poller.poll(self.WRITE_TIMEOUT):
+                raise OSError(_ETIMEDOUT)
+
+    def wait_msg(self):
+        if self._reader is not None:
+            raise simple.MQTTException("Inbound packets are handled by run()")
+        return super().wait_msg()
+
+    def check_msg(self):
+        # Nothing to poll: run() delivers messages as soon as they arrive.
+        return None
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        try:
+            if qos != 1 or self._reader is None:
+                return super().publish(topic, msg, retain, qos)
+            # PUBACKs are consumed by run(), so never block waiting for them
+            if len(self.inflight) >= (self.window or 1):
+                raise simple.MQTTException("QoS 1 window full")
+            pid = self._next_pid()
+            self._send_publish(topic, msg, retain, 1, pid)
+            self.inflight[pid] = [time.ticks_ms(), topic, msg, retain]
+            return pid
+        except OSError:
+            # Drop the socket so run() notices and reconnects
+            self._close()
+            raise
+
+    async def apublish(self, topic, msg, retain=False, qos=0, timeout_ms=None):
+        """publish() for tasks: waits for room in the QoS 1 window.
+
+        Raises OSError when the session is down or drops while waiting, or
+        when no room frees up within timeout_ms (WINDOW_TIMEOUT by default).
+        """
+        if timeout_ms is None:
+            timeout_ms = self.WINDOW_TIMEOUT
+        start = time.ticks_ms()
+        while 1:
+            if self._reader is None:
+                raise OSError(errno.ENOTCONN)
+            if qos != 1 or len(self.inflight) < (self.window or 1):
+                return self.publish(topic, msg, retain, qos)
+            if time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+                raise OSError(_ETIMEDOUT)
+            await asyncio.sleep_ms(self.WINDOW_POLL)
+
+    async def flush_async(self, timeout_ms=None):
+        """Wait until every in-flight publish is acknowledged. Returns False
+        on timeout or if the session drops first."""
+        start = time.ticks_ms()
+        while self.inflight:
+            if self._reader is None:
+                return False
+            if timeout_ms is not None and time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+                return False
+            await asyncio.sleep_ms(self.WINDOW_POLL)
+        return True
+
+    def discard_inflight(self):
+        """Forget the unacknowledged publishes, e.g. a batch the caller
+        keeps in its own log and will send again."""
+        self.inflight.clear()
+
+    def _feed(self, data, n):
+        i = 0
+        while i < n:
+            st = self._st
+            if st == _ST_OP:
+                self._op = data[i]
+                self._rlen = 0
+                self._sh = 0
+                self._st = _ST_LEN
+                i += 1
+            elif st == _ST_LEN:
+                b = data[i]
+                i += 1
+                self._rlen |= (b & 0x7F) << self._sh
+                if b & 0x80:
+                    self._sh += 7
+                    if self._sh > 21:
+                        raise OSError(-1)  # Malformed remaining length
+                elif self._rlen == 0:
+                    self._dispatch(self._op, memoryview(self._body)[:0])
+                    self._st = _ST_OP
+                else:
+                    if self._rlen > self.MAX_PACKET:
+                        raise OSError(-1)
+                    if self._rlen > len(self._body):
+                        self._body = bytearray(self._rlen)
+                    self._pos = 0
+                    self._st = _ST_BODY
+            else:
+                k = min(n - i, self._rlen - self._pos)
+                self._body[self._pos : self._pos + k] = data[i : i + k]
+                self._pos += k
+                i += k
+                if self._pos == self._rlen:
+                    self._st = _ST_OP
+                    self._dispatch(self._op, memoryview(self._body)[: self._rlen])
+
+    def _dispatch(self, op, body):
+        t = op & 0xF0
+        if t == 0x30:  # PUBLISH
+            topic_len = body[0] << 8 | body[1]
+            topic = bytes(body[2 : 2 + topic_len])
+            p = 2 + topic_len
+            if op & 6:
+                pid = body[p] << 8 | body[p + 1]
+                p += 2
+            self.cb(topic, bytes(body[p:]))
+            if op & 6 == 2:
+                pkt = bytearray(b"\x40\x02\0\0")
+                pkt[2] = pid >> 8
+                pkt[3] = pid & 0xFF
+                self._write(pkt)
+            elif op & 6 == 4:
+                assert 0
+        elif t == 0x40:  # PUBACK
+            self.inflight.pop(body[0] << 8 | body[1], None)
+        # PINGRESP and SUBACK need no action here
+
+    async def _retransmit_loop(self):
+        while 1:
+            await asyncio.sleep_ms(self.ack_timeout // 2)
+            if self.inflight and self._reader is not None:
+                try:
+                    self._retransmit()
+                except OSError as e:
+                    self.log(False, e)
+                    self._close()
+
+    async def _keepalive_loop(self):
+        period = self.keepalive * 500
+        while 1:
+            await asyncio.sleep_ms(period)
+            if self._reader is None:
+                continue
+            if self._ping_at is not None and time.ticks_diff(self._rx_at, self._ping_at) < 0:
+                # Nothing received since the last PINGREQ: dead or half-open link
+                self.log(False, "PINGRESP timeout")
+                self._close()
+                continue
+            try:
+                self.ping()
+                self._ping_at = time.ticks_ms()
+            except OSError as e:
+                self.log(False, e)
+                self._close()
+
+    async def _open(self):
+        # Non-blocking TCP connect: an unreachable broker costs up to
+        # CONNECT_TIMEOUT of waiting, not of blocking the loop
+        addr = socket.getaddrinfo(self.server, self.port)[0][-1]
+        self._reader = None
+        self.sock = socket.socket()
+        self.sock.setblocking(False)
+        try:
+            self.sock.connect(addr)
+        except OSError as e:
+            if e.args[0] != errno.EINPROGRESS:
+                raise
+        poller = select.poll()
+        poller.register(self.sock, select.POLLOUT)
+        start = time.ticks_ms()
+        while 1:
+            res = poller.poll(0)
+            if res:
+                if res[0][1] & (select.POLLERR | select.POLLHUP):
+                    raise OSError(errno.ECONNREFUSED)
+                break
+            if time.ticks_diff(time.ticks_ms(), start) >= self.CONNECT_TIMEOUT * 1000:
+                raise OSError(_ETIMEDOUT)
+            await asyncio.sleep_ms(self.CONNECT_POLL)
+        self.sock.settimeout(self.HANDSHAKE_TIMEOUT)
+
+    async def _reconnect(self):
+        delay = self.DELAY
+        while 1:
+            if self.link_up is not None and not self.link_up():
+                # No network: nothing to try until the link is back
+                await asyncio.sleep(self.DELAY)
+                continue
+            try:
+                await self._open()
+                self._session(False)
+                for topic, qos in self._topics:
+                    super().subscribe(topic, qos)
+                break
+            except Exception as e:
+                # OSError, but also a refused CONNACK (MQTTException) or a
+                # short read while parsing it (AssertionError, IndexError)
+                self.log(True, e)
+                self._close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.MAX_DELAY)
+        if self.on_connect:
+            try:
+                self.on_connect()
+            except Exception as e:
+                self.log(True, e)
+
+    async def run(self):
+        """Receive task: await data, parse it and dispatch it until cancelled."""
+        if self.sock is None:
+            await self._reconnect()
+        asyncio.create_task(self._retransmit_loop())
+        if self.keepalive:
+            asyncio.create_task(self._keepalive_loop())
+        while 1:
+            try:
+                self._attach()
+                while 1:
+                    n = await self._reader.readinto(self._rmv)
+                    if n is None:
+                        continue
+                    if not n:
+                        raise OSError(-1)  # Connection closed by the broker
+                    self._rx_at = time.ticks_ms()
+                    self._feed(self._rmv, n)
+            except Exception as e:
+                # OSError, AttributeError (the socket was dropped by
+                # publish() or the keepalive) or a malformed packet
+                self.log(False, e)
+            self._close()
+            await self._reconnect()
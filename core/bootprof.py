@@ -0,0 +1,94 @@
+# Perfil de arranque: tiempo y memoria de cada import y tiempo hasta la
+# primera publicación.
+#
+# main.py llama a start() antes de cualquier otro import. Desde ese momento
+# cada import que carga un módulo nuevo queda registrado con su tiempo (ms)
+# y la memoria que asignó (bytes, incluye los módulos que importa). Node
+# marca los hitos del arranque (Wi-Fi, NTP, MQTT, primera publicación) y al
+# publicar por primera vez se imprime el informe y se guarda en REPORT_FILE.
+import builtins
+import gc
+import sys
+import time
+
+REPORT_FILE = "boot.prof"
+
+_import = None  # __import__ original mientras el perfil está activo
+_t0 = None
+_depth = 0
+_records = []  # [nombre, profundidad, us, bytes]
+_marks = []  # (hito, ms desde start())
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+    global _depth
+    # MicroPython no pasa globals a __import__: los imports relativos se
+    # registran con sus puntos (".simple")
+    label = name
+    if level:
+        label = "." * level + (name or fromlist[0])
+    loaded = len(sys.modules)
+    record = [label, _depth, 0, 0]
+    _records.append(record)
+    _depth += 1
+    alloc = gc.mem_alloc()
+    t = time.ticks_us()
+    try:
+        return _import(name, globals, locals, fromlist, level)
+    finally:
+        record[2] = time.ticks_diff(time.ticks_us(), t)
+        record[3] = gc.mem_alloc() - alloc
+        _depth -= 1
+        # Un import de un módulo ya cargado no cuesta nada: no se registra
+        if len(sys.modules) == loaded and _records[-1] is record:
+            _records.pop()
+
+
+# Activa el registro de imports
+def start():
+    global _import, _t0
+    if _import is not None:
+        return
+    _t0 = time.ticks_ms()
+    _import = builtins.__import__
+    builtins.__import__ = _profiled_import
+
+
+# Deja de registrar imports (los hitos se siguen registrando)
+def stop():
+    global _import
+    if _import is not None:
+        builtins.__import__ = _import
+        _import = None
+
+
+# Registra un hito del arranque
+def mark(name):
+    if _t0 is None or _marks is None:
+        return
+    _marks.append((name, time.ticks_diff(time.ticks_ms(), _t0)))
+
+
+# Imprime el informe y lo guarda en REPORT_FILE. Sólo la primera vez.
+def report():
+    global _records, _marks
+    if _t0 is None or _marks is None:
+        return
+    stop()
+    lines = ["Perfil de arranque"]
+    for name, depth, us, size in _records:
+        lines.append("{:<26} {:>8.1f} ms {:>7d} B".format("  " * depth + name, us / 1000, size))
+    for name, ms in _marks:
+        lines.append("{:<26} {:>8d} ms".format(name, ms))
+    lines.append("Memoria libre: {} B".format(gc.mem_free()))
+    _records = None
+    _marks = None
+    for line in lines:
+        print(line)
+    try:
+        with open(REPORT_FILE, "w") as f:
+            for line in lines:
+                f.write(line)
+                f.write("\n")
+    except OSError as e:
+        print("Error guardando perfil de arranque:", e)
@@ -0,0 +1,92 @@
+import time
+
+# Segundos entre 1970-01-01 y el epoch de la placa (2000-01-01 en el ESP32)
+EPOCH_OFFSET = 946684800 if time.gmtime(0)[0] == 2000 else 0
+
+DRIFT_PPM = 50  # Deriva máxima esperada del reloj de la placa
+DRIFT_BUDGET_MS = 1000  # Error de hora admitido antes de volver a sincronizar por NTP
+MAX_ANCHOR_MS = 86400000  # Reanclaje mínimo: ticks_diff sólo es válido ~6 días
+
+
+# Escribe v (0-99) con dos dígitos en buf[i:i+2]
+def _put2(buf, i, v):
+    buf[i] = 0x30 + v // 10
+    buf[i + 1] = 0x30 + v % 10
+
+
+# Offset de zona horaria en segundos (ej: '-03:00' -> -10800)
+def parse_offset(timezone):
+    try:
+        sign = -1 if timezone[0] == '-' else 1
+        return sign * (int(timezone[1:3]) * 3600 + int(timezone[4:6]) * 60)
+    except Exception as e:
+        print("Error en zona horaria, se usa UTC:", e)
+        return 0
+
+
+class Clock:
+    """
+    Hora local anclada a time.ticks_ms().
+
+    La zona horaria se interpreta una sola vez. Tras cada sincronización se
+    toma la hora de la placa y el valor de ticks_ms(); a partir de ahí la
+    hora se calcula sumando los ticks transcurridos, sin mktime() ni
+    localtime(). datetime() devuelve siempre el mismo bytearray y sólo
+    reescribe sus dígitos cuando cambió el segundo; la fecha, sólo cuando
+    cambió el día.
+
+    resync_ms es cada cuánto hay que volver a sincronizar por NTP para que la
+    deriva del reloj (drift_ppm) no supere drift_budget_ms.
+    """
+
+    def __init__(self, timezone="+00:00", drift_ppm=DRIFT_PPM, drift_budget_ms=DRIFT_BUDGET_MS):
+        self.offset = parse_offset(timezone)
+        self.resync_ms = min(drift_budget_ms * 1000000 // drift_ppm, MAX_ANCHOR_MS)
+        self._last = None  # Último segundo formateado
+        self._day = None  # Último día formateado
+        self.text = bytearray(b"2000-01-01 00:00:00")
+        self.anchor()
+
+    # Toma la hora actual de la placa como referencia
+    def anchor(self):
+        try:
+            ms = time.time_ns() // 1000000
+            self._sec = ms // 1000
+            self._frac = ms % 1000
+        except AttributeError:
+            self._sec = time.time()
+            self._frac = 0
+        self._ticks = time.ticks_ms()
+
+    # Milisegundos desde el último anclaje
+    def since_anchor(self):
+        return time.ticks_diff(time.ticks_ms(), self._ticks)
+
+    # Segundos UTC desde el epoch de la placa
+    def utc_seconds(self):
+        return self._sec + (self.since_anchor() + self._frac) // 1000
+
+    # Segundos desde 1970-01-01 (UTC)
+    def epoch(self):
+        return self.utc_seconds() + EPOCH_OFFSET
+
+    # Fecha y hora local formateada (AAAA-MM-DD hh:mm:ss) en self.text
+    def datetime(self):
+        s = self.utc_seconds() + self.offset
+        if s == self._last:
+            return self.text
+        t = self.text
+        day = s // 86400
+        if day != self._day:
+            year, month, mday = time.gmtime(day * 86400)[:3]
+            _put2(t, 0, year // 100)
+            _put2(t, 2, year % 100)
+            _put2(t, 5, month)
+            _put2(t, 8, mday)
+            self._day = day
+        sod = s - day * 86400
+        _put2(t, 11, sod // 3600)
+        _put2(t, 14, sod // 60 % 60)
+        _put2(t, 17, sod % 60)
+        self._last = s
+        return t
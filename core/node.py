@@ -0,0 +1,697 @@
+from machine import Pin, reset
+from .wifi_manager import WifiManager
+from .asyncmqtt import MQTTClient
+from .ringlog import RingLog, RECORD_HEADER
+from .scheduler import Scheduler
+from .clock import Clock
+from .payload import Payload, SizeEstimate, PAYLOAD_SIZE
+from .telemetry import Telemetry
+from .schemas import SCHEMAS, schema_id
+from .report import ReportPolicy
+from .aggregate import Aggregator, MAX_FIELDS
+from . import bootprof
+import ntptime
+import ssl
+import time
+import uos
+import gc
+import sys
+import json
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+# Archivos de configuración del dispositivo
+CONFIG_FILE = "interval.conf"
+SAMPLE_FILE = "sample.conf"  # Período del muestreo rápido (0 = desactivado)
+WIFI_FILE = "wifi.dat"
+TIMEZONE_FILE = "timezone.conf"
+DEFAULT_INTERVAL = 5
+WIFI_CHECK_INTERVAL = 10000  # 10 segundos
+
+# Cola persistente para lecturas tomadas sin conexión: 256 KB en ranuras del
+# tamaño máximo de la lectura (512 ranuras de 512 bytes en el caso mínimo)
+SPOOL_FILE = "spool"
+SPOOL_BYTES = 512 * 512
+MAX_PAYLOAD_SIZE = 2040  # Lectura JSON más grande admitida (ranura de 2 KB)
+SPOOL_BATCH = 16  # Lecturas enviadas por lote al recuperar la conexión
+SPOOL_ACK_TIMEOUT = 10000  # Tiempo máximo de espera de confirmaciones del lote (ms)
+
+# Keepalive MQTT (s): el cliente envía un PINGREQ cada MQTT_KEEPALIVE / 2
+# segundos (AWS IoT Core admite hasta 1200 s)
+MQTT_KEEPALIVE = 300
+
+# Planificador de tareas (muestreo, publicación, Wi-Fi, botón y memoria)
+PUBLISH_INTERVAL = 1000  # Revisión de lecturas pendientes y de la cola (ms)
+BUTTON_POLL_INTERVAL = 100  # Lectura del botón BOOT (ms)
+GC_INTERVAL = 1000  # Liberación periódica de memoria (ms)
+PAYLOAD_POOL = 4  # Buffers de lecturas a la espera de la tarea de publicación
+
+
+class Node:
+    """
+    Firmware común de los nodos EnviroSense.
+
+    Concentra lo que antes repetía cada main.py: conexión Wi-Fi, hora por NTP,
+    certificados y SSL, cliente MQTT, comandos remotos (lectura inmediata,
+    intervalo y política de reporte), intervalo persistente, botón BOOT,
+    cola persistente y
+    planificador de tareas. Cada nodo sólo inicializa sus sensores y pasa una
+    tabla de drivers: una lista de pares (nombre, función) donde cada función
+    recibe el Payload de la lectura y escribe en él los campos que aporta.
+
+    schema es el nombre del esquema de telemetría binaria del nodo (ver
+    core/schemas.py), que se usa si config.AWS_TOPIC_PUB_BIN está definido.
+
+    aggregate son los campos (bytes) que, con el muestreo rápido activado
+    (comando "sample"), se resumen con estadísticas en cada ventana de
+    reporte (ver core/aggregate.py).
+
+    reserve son campos (clave, formato, decimales) que los drivers pueden
+    escribir más adelante aunque no aparezcan en la lectura de prueba del
+    arranque (por ejemplo sondas conectadas en caliente): se suman al
+    cálculo del tamaño de los buffers.
+
+    Los nodos con comandos propios (por ejemplo el actuador) heredan de Node
+    y redefinen handle_message().
+    """
+
+    def __init__(self, config, drivers, code_key="sensor_code", code=None, schema=None, aggregate=(), reserve=()):
+        self.config = config
+        self.drivers = drivers
+        self.code_key = code_key
+        self.code = config.SENSOR_CODE if code is None else code
+        self.sensor_interval = DEFAULT_INTERVAL
+        self.wifi_connected = False
+        self.wm = WifiManager()
+
+        # Configurar botón BOOT (GPIO0) con pull-up
+        self.boot_button = Pin(0, Pin.IN, Pin.PULL_UP)
+        self.led = Pin(2, Pin.OUT)  # LED azul en GPIO2 (común en ESP32)
+
+        # Buffers y ranuras de la cola del tamaño de la lectura más grande posible
+        self.payload_size = self.max_payload_size(schema, aggregate, reserve)
+        record_size = self.payload_size + RECORD_HEADER
+        self.spool = RingLog(SPOOL_FILE, record_size=record_size, capacity=SPOOL_BYTES // record_size)
+        self.sched = Scheduler()
+        self.sample_task = None
+        self.fast_task = None  # Muestreo rápido, con agregación por ventana
+        self.sample_period = 0
+        self.agg = Aggregator(aggregate) if aggregate else None
+        self.publish_task = None
+        self.draining = False  # Tarea de envío de la cola en curso
+        # Lecturas armadas en buffers preasignados: JSON (core/payload.py) o,
+        # si hay tópico binario configurado, binario (core/telemetry.py)
+        self.topic_bin = getattr(config, "AWS_TOPIC_PUB_BIN", "")
+        if self.topic_bin and schema:
+            sid = schema_id(schema)
+            self.free = [Telemetry(sid, self.code) for _ in range(PAYLOAD_POOL)]
+        else:
+            self.topic_bin = ""
+            self.free = [Payload({code_key: self.code}, self.payload_size) for _ in range(PAYLOAD_POOL)]
+
+        # Reporte por cambio: los codificadores le pasan cada campo
+        self.report = ReportPolicy()
+        for p in self.free:
+            p.watch = self.report.check
+        self.pending = []  # Lecturas listas para publicar
+
+        # Hora local anclada a ticks_ms; "datetime" como texto o como epoch
+        self.clock = Clock(self.load_timezone())
+        self.epoch_timestamps = getattr(config, "TIMESTAMP_EPOCH", False)
+        self.time_synced = False
+        self.mqtt_client = self.create_mqtt_client()
+
+        # Liberamos la memoria
+        gc.collect()
+
+    # Tamaño de los buffers de lectura: campos del esquema, los reservados
+    # y los que escriben los drivers en una lectura de prueba, con el mayor
+    # valor de cada uno y las estadísticas del muestreo rápido. Una lectura que no entra en
+    # MAX_PAYLOAD_SIZE, o con más campos de los que agrega el muestreo
+    # rápido, detiene el arranque.
+    def max_payload_size(self, schema, aggregate, reserve=()):
+        fields = SCHEMAS[schema_id(schema)][2] if schema else ()
+        est = SizeEstimate({self.code_key: self.code}, tuple(fields) + tuple(reserve), aggregate)
+        self.read_drivers(est)
+        size = est.size()
+        print("Tamaño máximo de la lectura:", size, "bytes,", est.fields, "campos")
+        if size > MAX_PAYLOAD_SIZE:
+            raise ValueError("Lectura de hasta {} bytes, el máximo es {}".format(size, MAX_PAYLOAD_SIZE))
+        if aggregate and est.fields > MAX_FIELDS:
+            raise ValueError("{} campos, el muestreo rápido admite {}".format(est.fields, MAX_FIELDS))
+        # Ranura de la cola múltiplo de 64 bytes
+        record_size = (size + RECORD_HEADER + 63) // 64 * 64
+        return max(record_size - RECORD_HEADER, PAYLOAD_SIZE)
+
+    # Método para conectar Wi-Fi con mejor manejo de errores
+    def connect_wifi(self):
+        try:
+            if not self.wm.is_connected():
+                print("Intentando conectar red Wi-Fi...")
+                self.wm.connect()
+                if self.wm.is_connected():
+                    self.wifi_connected = True
+                    self.led.on()
+                    return True
+            self.wifi_connected = False
+            self.led.off()
+            return False
+        except Exception as e:
+            print("Error en la conexión de Wi-Fi:", e)
+            self.wifi_connected = False
+            self.led.off()
+            return False
+
+    # Método para verificar estado del WiFi
+    def check_wifi_connection(self):
+        # La cadencia (WIFI_CHECK_INTERVAL) la fija la tarea del planificador
+        if not self.wm.is_connected():
+            print("Wi-Fi desconectado. Intentando reconectar...")
+            self.wifi_connected = self.connect_wifi()
+            return self.wifi_connected
+
+        self.wifi_connected = True
+        return self.wifi_connected
+
+    # Método para sincronizar tiempo con NTP
+    def sync_time(self, max_retries=5):
+        for i in range(max_retries):
+            try:
+                print(f"Intentando sincronizar hora (intento {i+1}/{max_retries})...")
+                ntptime.host = "time.google.com"  # Servidor alternativo
+                before = self.clock.utc_seconds()
+                ntptime.settime()
+                self.clock.anchor()
+                print("Hora sincronizada:", time.localtime())
+                print("Corrección del reloj:", self.clock.utc_seconds() - before, "s")
+                self.time_synced = True
+                return True
+            except OSError as e:
+                print("Error sincronizando hora:", e)
+                if i + 1 < max_retries:
+                    time.sleep(2)
+        print("Error: No se pudo sincronizar la hora después de", max_retries, "intentos")
+        return False
+
+    # Resincronización periódica para acotar la deriva del reloj. Sin Wi-Fi
+    # o sin respuesta NTP se reancla a la hora de la placa.
+    def resync_time(self):
+        if not (self.wifi_connected and self.sync_time(max_retries=1)):
+            self.clock.anchor()
+
+    # Leer la zona horaria desde el archivo de configuración
+    def load_timezone(self):
+        try:
+            with open(TIMEZONE_FILE, 'r') as f:
+                timezone = f.read().strip()
+                print("Zona horaria configurada:", timezone)
+                return timezone
+        except Exception as e:
+            print("Error leyendo zona horaria:", e)
+            raise
+
+    # Carga de certificados, configuración SSL y creación del cliente MQTT
+    def create_mqtt_client(self):
+        try:
+            print("Cargando certificados...")
+            with open("aws/client.key", "rb") as f:
+                client_key = f.read()
+            with open("aws/client.crt", "rb") as f:
+                client_crt = f.read()
+            with open("aws/root.crt", "rb") as f:
+                root_crt = f.read()
+            print("Certificados cargados correctamente")
+        except Exception as e:
+            print("Error cargando certificados:", e)
+            raise
+
+        try:
+            print("Configurando SSL...")
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.verify_mode = ssl.CERT_REQUIRED
+            context.load_cert_chain(client_crt, client_key)
+            context.load_verify_locations(cadata=root_crt)
+            print("SSL configurado correctamente")
+        except Exception as e:
+            print("Error configurando SSL:", e)
+            raise
+
+        try:
+            print("Creando cliente MQTT...")
+            client = MQTTClient(
+                client_id=self.config.AWS_CLIENT_ID,
+                server=self.config.AWS_ENDPOINT,
+                port=8883,
+                keepalive=MQTT_KEEPALIVE,
+                ssl=context,
+                window=SPOOL_BATCH,
+            )
+            # Sin Wi-Fi la tarea de recepción no intenta reconectar
+            client.link_up = self.wm.is_connected
+            print("Cliente MQTT creado")
+            return client
+        except Exception as e:
+            print("Error creando cliente MQTT:", e)
+            raise
+
+    # Publica una respuesta en el tópico de comandos
+    def respond(self, response):
+        response[self.code_key] = self.code
+        self.mqtt_client.publish(self.config.AWS_TOPIC_SUB, json.dumps(response), qos=0)
+
+    # Callback para mensajes entrantes
+    def subscription_cb(self, topic, message):
+        print("\nMensaje recibido:")
+        print("Tópico:", topic.decode("utf-8"))
+        print("Mensaje:", message.decode("utf-8"))
+        print("-------------------")
+
+        try:
+            msg = json.loads(message.decode("utf-8"))
+
+            # Verificar si el mensaje es para este dispositivo
+            if msg.get(self.code_key) != self.code:
+                print("Mensaje no destinado a este dispositivo")
+                return
+
+            self.handle_message(msg)
+
+        except Exception as e:
+            print("Error procesando mensaje:", e)
+            self.handle_error(e)
+
+        # Liberamos la memoria
+        gc.collect()
+
+    # Comandos comunes: lectura inmediata, intervalo, muestreo rápido y política de reporte
+    def handle_message(self, msg):
+        # Comando para lectura inmediata
+        if msg.get("command") == "read_now":
+            print("Comando de lectura inmediata recibido")
+
+            # Enviar confirmación
+            self.respond({"command": "read_now_ack", "status": "received"})
+            print("Confirmación de lectura enviada al servidor")
+
+            # Ejecutar lectura inmediata
+            self.sched.once(0, self.leer_ahora, "lectura inmediata")
+
+        # Confirmación propia de lectura inmediata
+        elif msg.get("command") == "read_now_ack":
+            pass
+
+        # Cambio de intervalo
+        elif "interval" in msg:
+            self.handle_interval_change(msg)
+
+        # Muestreo rápido con agregación
+        elif "sample" in msg:
+            self.handle_sample_change(msg)
+
+        # Política de reporte por cambio
+        elif "report" in msg:
+            self.handle_report_change(msg)
+
+    # Errores al procesar un mensaje entrante
+    def handle_error(self, e):
+        pass
+
+    # Metodo para manejar mensajes de intervalo
+    def handle_interval_change(self, msg):
+        new_interval = msg.get("interval")
+
+        # Validar intervalo: con muestreo rápido debe ser mayor al período
+        if not (isinstance(new_interval, int) and 1 <= new_interval <= 86400) or \
+                new_interval <= self.sample_period:
+            print("Intervalo inválido:", new_interval)
+            self.respond({"interval": "ERROR"})
+            return
+
+        # Actualizar y guardar intervalo
+        self.sensor_interval = new_interval
+        if self.save_interval(new_interval):
+            # Reprogramar la tarea de muestreo
+            self.sched.reschedule(self.sample_task, period_ms=new_interval * 1000)
+            print("Intervalo actualizado:", new_interval)
+
+            # Enviar confirmación
+            self.respond({"interval": "OK", "seconds_to_report": new_interval})
+            print("Confirmación enviada al servidor")
+
+    # Metodo para manejar mensajes de muestreo rápido
+    def handle_sample_change(self, msg):
+        period = msg.get("sample")
+
+        # Validar período: 0 desactiva, si no debe ser menor al intervalo
+        if self.agg is None or not (isinstance(period, int) and 0 <= period < self.sensor_interval):
+            print("Período de muestreo inválido:", period)
+            self.respond({"sample": "ERROR"})
+            return
+        if self.save_sample_period(period):
+            self.set_sample_period(period)
+            print("Muestreo rápido actualizado:", period)
+            self.respond({"sample": "OK", "seconds_to_sample": period})
+
+    # Activa, cambia o desactiva el muestreo rápido
+    def set_sample_period(self, period):
+        self.sample_period = period
+        if self.fast_task is not None:
+            self.sched.cancel(self.fast_task)
+            self.fast_task = None
+        self.agg.reset()
+        if period:
+            self.fast_task = self.sched.every(period * 1000, self.muestrear, "muestreo rapido")
+
+    # Metodo para manejar mensajes de política de reporte
+    def handle_report_change(self, msg):
+        if self.report.configure(msg.get("report")) and self.report.save():
+            print("Política de reporte actualizada:", self.report.to_dict())
+            response = self.report.to_dict()
+            response["report"] = "OK"
+        else:
+            print("Política de reporte inválida:", msg.get("report"))
+            response = {"report": "ERROR"}
+        self.respond(response)
+
+    # Método para reiniciar el dispositivo
+    def check_boot_button(self):
+        try:
+            if self.boot_button.value() == 0:
+                time.sleep(0.1)  # Esperar 100ms para confirmar pulsación
+                if self.boot_button.value() == 0:  # Si sigue presionado, iniciar conteo
+                    print("\nBotón BOOT detectado - Iniciando conteo...")
+                    start_time = time.ticks_ms()
+                    pressed = True
+                    while time.ticks_diff(time.ticks_ms(), start_time) < 3000:
+                        if self.boot_button.value() == 1:
+                            pressed = False
+                            break
+                        time.sleep_ms(100)
+
+                    if pressed:
+                        print("\n--- RESETEO DE CONFIGURACIÓN ---")
+                        try:
+                            uos.remove(WIFI_FILE)
+                            print(f"Archivo {WIFI_FILE} eliminado")
+                        except OSError as e:
+                            print(f"Error eliminando el archivo: {e}")
+
+                        print("Reiniciando dispositivo...\n")
+                        time.sleep(1)
+                        reset()
+                    else:
+                        print("Reset cancelado")
+            return False
+        except Exception as e:
+            print("Error en check_boot_button:", e)
+
+    # Cargar intervalo de envío de datos
+    def load_interval(self):
+        try:
+            with open(CONFIG_FILE, 'r') as f:
+                interval = int(f.read())
+                print(f"Intervalo de envío de datos configurado en: {interval} segundos")
+                return interval
+        except:
+            print(f"No se pudo cargar el intervalo, usando valor por defecto: {DEFAULT_INTERVAL} segundos")
+            return DEFAULT_INTERVAL
+
+    # Guardar intervalo de envío de datos
+    def save_interval(self, value):
+        try:
+            with open(CONFIG_FILE, 'w') as f:
+                f.write(str(value))
+            print(f"Intervalo guardado: {value} segundos")
+            return True
+        except Exception as e:
+            print(f"Error guardando intervalo: {e}")
+            return False
+
+    # Cargar período del muestreo rápido
+    def load_sample_period(self):
+        try:
+            with open(SAMPLE_FILE, 'r') as f:
+                period = int(f.read())
+        except:
+            return 0
+        # El período tiene que ser menor al intervalo de reporte
+        if not 0 <= period < self.sensor_interval:
+            print(f"Período de muestreo inválido ({period} segundos), muestreo rápido desactivado")
+            return 0
+        print(f"Muestreo rápido configurado en: {period} segundos")
+        return period
+
+    # Guardar período del muestreo rápido
+    def save_sample_period(self, value):
+        try:
+            with open(SAMPLE_FILE, 'w') as f:
+                f.write(str(value))
+            return True
+        except Exception as e:
+            print(f"Error guardando período de muestreo: {e}")
+            return False
+
+    # Buffer libre para una lectura. Si la publicación viene atrasada, la
+    # lectura pendiente más antigua pasa a la cola persistente. None si no
+    # queda ningún buffer.
+    def take_payload(self):
+        if self.free:
+            return self.free.pop()
+        if not self.pending:
+            return None
+        p = self.pending.pop(0)
+        self.spool.append(p.view())
+        return p
+
+    # Se acceden a los sensores de la tabla de drivers. Un sensor con error
+    # no impide publicar los demás.
+    def read_drivers(self, p):
+        for name, read in self.drivers:
+            start = p.mark()
+            try:
+                read(p)
+            except Exception as e:
+                p.rewind(start)  # Descartar los campos a medio escribir
+                print("Error leyendo", name, ":", e)
+
+    # Muestra rápida: se suma a las estadísticas de la ventana
+    def muestrear(self):
+        try:
+            self.agg.begin()
+            self.read_drivers(self.agg)
+            self.agg.commit()
+        except Exception as e:
+            print("Error en muestrear:", e)
+
+    # Lectura pedida por comando o por un cambio de estado: se publica
+    # aunque la política de reporte no lo exija
+    def leer_ahora(self):
+        self.leer_sensores(force=True)
+
+    # Leer sensores y dejar la lectura lista para publicar
+    def leer_sensores(self, force=False):
+        p = None
+        try:
+            p = self.take_payload()
+            if p is None:
+                print("Sin buffers libres para la lectura")
+                return
+            p.begin()
+            self.report.begin()
+
+            # Con muestreo rápido se publica el resumen de la ventana; si no,
+            # se leen los sensores
+            if self.fast_task is not None and self.agg.samples:
+                self.agg.emit(p)
+            else:
+                self.read_drivers(p)
+
+            # Sin cambios que superen la banda muerta: no se publica
+            if not self.report.due(force):
+                return
+            self.report.published()
+
+            p.stamp(self.clock, self.epoch_timestamps)
+
+            # La publicación la hace la tarea de publicación, fuera de la lectura
+            self.pending.append(p)
+            p = None
+            self.sched.reschedule(self.publish_task, delay_ms=0)
+
+        except Exception as e:
+            print("Error en leer_sensores:", e)
+
+        finally:
+            # Lectura descartada o con error: el buffer vuelve a quedar libre
+            if p is not None:
+                self.free.append(p)
+
+    # Tópico de una lectura: las lecturas JSON empiezan con '{' y las binarias
+    # con la versión del formato (también las guardadas antes de cambiar de formato)
+    def topic_for(self, payload):
+        if payload[0] == 0x7B or not self.topic_bin:
+            return self.config.AWS_TOPIC_PUB
+        return self.topic_bin
+
+    # Publicar las lecturas pendientes y lanzar el envío de las guardadas en la cola
+    def publicar(self):
+        mqtt_client = self.mqtt_client
+        spool = self.spool
+        while self.pending:
+            p = self.pending.pop(0)
+            payload = p.view()
+            sent = False
+
+            # Enviar por MQTT si está conectado
+            if mqtt_client.is_connected():
+                try:
+                    mqtt_client.publish(topic=self.topic_for(payload), msg=payload, qos=0)
+                    print("Mensaje publicado:", len(payload), "bytes")
+                    sent = True
+                    # Primera publicación: fin del perfil de arranque
+                    bootprof.mark("primera publicacion")
+                    bootprof.report()
+                except Exception as e:
+                    # La tarea de recepción MQTT se encarga de reconectar
+                    print("Error en cliente MQTT, reconectando en segundo plano:", e)
+
+            # Sin conexión: guardar la lectura para enviarla al reconectar
+            if not sent and spool.append(payload):
+                print("Lectura guardada en cola, pendientes:", len(spool))
+
+            # El buffer queda libre para la próxima lectura
+            self.free.append(p)
+
+        # La cola se envía en una tarea aparte: esperar las confirmaciones no
+        # detiene al planificador (muestreo, Wi-Fi, botón)
+        if len(spool) and mqtt_client.is_connected() and not self.draining:
+            self.draining = True
+            self.sched.spawn(self.vaciar_cola())
+
+    # Enviar la cola por lotes. Cada lote se publica con QoS 1 y se quita de
+    # la cola sólo cuando el broker confirmó todos sus mensajes; si la
+    # conexión se cae o no llegan las confirmaciones, queda en la cola y la
+    # próxima publicación lo vuelve a lanzar.
+    async def vaciar_cola(self):
+        mqtt_client = self.mqtt_client
+        spool = self.spool
+        try:
+            while len(spool) and mqtt_client.is_connected():
+                first = spool.head
+                records = spool.peek(SPOOL_BATCH)
+                for record in records:
+                    if record is not None:
+                        await mqtt_client.apublish(self.topic_for(record), record, qos=1)
+                if not await mqtt_client.flush_async(SPOOL_ACK_TIMEOUT):
+                    mqtt_client.discard_inflight()
+                    print("Lote de la cola sin confirmar, se reintentará")
+                    break
+                # Un desborde de la cola durante el lote pudo adelantar head
+                spool.commit(first + len(records) - spool.head)
+                print("Lote de la cola enviado, pendientes:", len(spool))
+                records = None
+                # Liberamos la memoria
+                gc.collect()
+        except Exception as e:
+            mqtt_client.discard_inflight()
+            print("Error enviando lecturas de la cola:", e)
+        finally:
+            self.draining = False
+
+    # Agrega una tarea periódica propia del nodo
+    def every(self, period_ms, fn, name=None):
+        return self.sched.every(period_ms, fn, name)
+
+    # Conexión inicial a Wi-Fi, NTP y AWS IoT Core
+    def start(self):
+        # Los imports del nodo ya terminaron
+        bootprof.stop()
+        bootprof.mark("imports")
+
+        print("\nIniciando dispositivo...")
+        self.led.off()  # Comenzar con LED apagado
+
+        # Intento inicial de conexión WiFi
+        try:
+            if not self.connect_wifi():
+                print("No se pudo conectar al Wi-Fi en el inicio")
+            else:
+                bootprof.mark("wifi")
+
+                # Sincronizar hora si WiFi está conectado
+                if not self.sync_time():
+                    print("Advertencia: No se pudo sincronizar la hora por NTP")
+                bootprof.mark("ntp")
+
+                # Liberamos la memoria
+                gc.collect()
+
+                # Conexión al servidor AWS IoT Core
+                print("Intentando conectar a AWS IoT Core...")
+                try:
+                    self.mqtt_client.connect()
+                    print("Conectado a AWS IoT Core correctamente")
+                    bootprof.mark("mqtt")
+
+                    # Suscribirse a topic de MQTT
+                    try:
+                        self.mqtt_client.set_callback(self.subscription_cb)
+                        self.mqtt_client.subscribe(self.config.AWS_TOPIC_SUB)
+                        print(f"Suscrito al tópico: {self.config.AWS_TOPIC_SUB}")
+                    except Exception as e:
+                        print("Error al suscribirse:", e)
+                except Exception as e:
+                    print("Error conectando a AWS IoT Core:", e)
+        except Exception as e:
+            print("Error en connect_wifi:", e)
+
+        # Si no hubo conexión, la tarea de recepción se conecta y suscribe
+        # en segundo plano
+        self.mqtt_client.set_callback(self.subscription_cb)
+        self.mqtt_client.add_subscription(self.config.AWS_TOPIC_SUB)
+
+        # Configuración inicial
+        self.sensor_interval = self.load_interval()
+        self.report.load()
+
+        # Tareas del planificador. La lectura de sensores y la publicación
+        # corren en el bucle principal y no en la interrupción de un Timer, así
+        # no compiten con la recepción MQTT por el socket.
+        sched = self.sched
+        self.sample_task = sched.every(self.sensor_interval * 1000, self.leer_sensores, "muestreo")
+        self.publish_task = sched.every(PUBLISH_INTERVAL, self.publicar, "publicacion")
+        if self.agg is not None:
+            self.set_sample_period(self.load_sample_period())
+        sched.every(WIFI_CHECK_INTERVAL, self.check_wifi_connection, "wifi")
+        # Si la hora no se sincronizó al inicio se reintenta al primer control de Wi-Fi
+        sched.every(self.clock.resync_ms, self.resync_time, "hora",
+                    delay_ms=self.clock.resync_ms if self.time_synced else WIFI_CHECK_INTERVAL)
+        sched.every(BUTTON_POLL_INTERVAL, self.check_boot_button, "boton")
+        sched.every(GC_INTERVAL, gc.collect, "memoria")
+        # Liberamos la memoria
+        gc.collect()
+
+    # Bucle principal: los mensajes MQTT los atiende la tarea de recepción
+    # en cuanto llegan, sin sondear el socket
+    async def main_loop(self):
+        self.sched.spawn(self.mqtt_client.run())
+        await self.sched.run()
+
+    # Código principal
+    def run(self):
+        try:
+            self.start()
+            asyncio.run(self.main_loop())
+
+        except KeyboardInterrupt:
+            print("\nPrograma detenido por el usuario")
+            self.led.off()
+            reset()
+
+        except Exception as e:
+            print("Error fatal:", e)
+            sys.print_exception(e)
+            time.sleep(2)
+            reset()
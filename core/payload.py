@@ -0,0 +1,204 @@
+import json
+from .schemas import RANGES
+
+PAYLOAD_SIZE = 504  # Tamaño mínimo: ranura de 512 bytes en la cola persistente
+STAMP_SIZE = 33  # ,"datetime":"AAAA-MM-DD hh:mm:ss" (reservado en cada mensaje)
+NUM_WIDTH = 12  # Ancho máximo supuesto de un número sin formato en el esquema
+
+_SCALE = (1, 10, 100, 1000, 10000)
+
+
+class Payload:
+    """
+    Mensaje JSON armado directamente sobre un bytearray reutilizable.
+
+    Los pares constantes del encabezado (por ejemplo el código del sensor) se
+    codifican una sola vez al crear el objeto. En cada lectura begin() vuelve
+    al final del encabezado y cada campo se escribe en su lugar: las claves
+    son bytes constantes y los números se formatean en punto fijo dígito a
+    dígito, sin round(), sin diccionario intermedio y sin pasar por str.
+    view() cierra el objeto y devuelve el mensaje como memoryview, que se
+    publica o se guarda en la cola tal cual.
+
+    Los drivers de los nodos reciben el Payload y escriben sus campos:
+
+        def read_pzem(p):
+            p.num(b"voltage", pzem.getVoltage(), 2)
+
+    Los últimos STAMP_SIZE bytes quedan reservados para stamp(): un driver
+    que no entra falla solo (se descartan sus campos) y la hora de la
+    lectura siempre entra. El tamaño del buffer lo calcula Node con
+    SizeEstimate.
+    """
+
+    def __init__(self, head, size=PAYLOAD_SIZE):
+        self.buf = bytearray(size)
+        self._mv = memoryview(self.buf)
+        self.size = size
+        self.limit = size - STAMP_SIZE  # Fin de los campos de los drivers
+        data = json.dumps(head, separators=(",", ":")).encode()
+        data = data[:-1]  # Sin la llave de cierre
+        self.buf[:len(data)] = data
+        self._start = len(data)
+        self.n = self._start  # Bytes escritos
+        self.watch = None  # Recibe (clave, valor) de cada número (ver core/report.py)
+
+    # Comienza un mensaje nuevo a continuación del encabezado
+    def begin(self):
+        self.n = self._start
+
+    # Posición actual, para descartar los campos de un driver con error
+    def mark(self):
+        return self.n
+
+    def rewind(self, mark):
+        self.n = mark
+
+    def _put(self, data):
+        n = self.n
+        end = n + len(data)
+        if end >= self.limit:  # Se reserva un byte para la llave de cierre
+            raise ValueError("Mensaje demasiado grande")
+        self.buf[n:end] = data
+        self.n = end
+
+    def _key(self, key):
+        if self.buf[self.n - 1] != 0x7B:  # '{'
+            self._put(b',"')
+        else:
+            self._put(b'"')
+        self._put(key)
+        self._put(b'":')
+
+    # Entero con `point` decimales implícitos (12345, 2 -> 123.45)
+    def _digits(self, v, point):
+        buf = self.buf
+        n = self.n
+        if v < 0:
+            buf[n] = 0x2D  # '-'
+            n += 1
+            v = -v
+        count = 1
+        t = v
+        while t >= 10:
+            t //= 10
+            count += 1
+        if count <= point:
+            count = point + 1
+        end = n + count + (1 if point else 0)
+        if end >= self.limit:
+            raise ValueError("Mensaje demasiado grande")
+        i = end
+        k = 0
+        while k < count:
+            if point and k == point:
+                i -= 1
+                buf[i] = 0x2E  # '.'
+            i -= 1
+            buf[i] = 0x30 + v % 10
+            v //= 10
+            k += 1
+        self.n = end
+
+    # Número con `decimals` decimales fijos (None se envía como null)
+    def num(self, key, value, decimals=2):
+        if self.watch is not None:
+            self.watch(key, value)
+        self._key(key)
+        if value is None:
+            self._put(b"null")
+            return
+        if not decimals and isinstance(value, int):
+            self._digits(value, 0)
+            return
+        value *= _SCALE[decimals]
+        self._digits(int(value - 0.5 if value < 0 else value + 0.5), decimals)
+
+    # Texto ASCII sin comillas ni barras (códigos, fechas); bytes o bytearray
+    def text(self, key, value):
+        self._key(key)
+        if isinstance(value, str):
+            value = value.encode()
+        self._put(b'"')
+        self._put(value)
+        self._put(b'"')
+
+    # Fecha y hora de la lectura: texto local o segundos desde 1970 (UTC)
+    def stamp(self, clock, epoch=False):
+        self.limit = self.size
+        try:
+            if epoch:
+                self.num(b"datetime", clock.epoch(), 0)
+            else:
+                self.text(b"datetime", clock.datetime())
+        finally:
+            self.limit = self.size - STAMP_SIZE
+
+    # Mensaje terminado, listo para publicar
+    def view(self):
+        self.buf[self.n] = 0x7D  # '}'
+        return self._mv[:self.n + 1]
+
+
+# Ancho del mayor número de un formato del esquema con sus decimales
+def num_width(fmt, decimals):
+    lo, hi = RANGES[fmt]
+    width = max(len(str(lo)), len(str(hi)), decimals + 1 + (lo < 0))
+    return max(width + (1 if decimals else 0), 4)  # null
+
+
+class SizeEstimate:
+    """
+    Tamaño máximo de un mensaje JSON, con la misma interfaz que Payload.
+
+    Se crea con los campos del esquema del nodo y se le pasan los drivers
+    una vez al arrancar: cuenta cada clave una sola vez, con el ancho del
+    mayor número que admite su formato en el esquema (NUM_WIDTH si no está
+    en el esquema). Un driver con error no descuenta los campos que llegó a
+    escribir. Los campos de `aggregate` suman además sus estadísticas del
+    muestreo rápido (ver core/aggregate.py). size() incluye la hora de la
+    lectura y la llave de cierre; fields es la cantidad de campos distintos
+    que escribieron los drivers.
+    """
+
+    def __init__(self, head, fields=(), aggregate=()):
+        self._head = len(json.dumps(head, separators=(",", ":"))) - 1
+        self._keys = {}  # clave -> ancho máximo del campo
+        for key, fmt, decimals in fields:
+            self._keys[key.encode()] = len(key) + 4 + num_width(fmt, decimals)
+        self._aggregate = aggregate
+        self._written = {}
+        self.fields = 0
+
+    def begin(self):
+        pass
+
+    def mark(self):
+        return 0
+
+    def rewind(self, mark):
+        pass
+
+    def num(self, key, value, decimals=2):
+        if key in self._written:
+            return
+        self._written[key] = True
+        self.fields += 1
+        self._add(key)
+        if key in self._aggregate:
+            self._add(key + b"_min")
+            self._add(key + b"_max")
+            self._add(key + b"_std")
+            self._add(b"samples")
+
+    def _add(self, key):
+        if key not in self._keys:
+            self._keys[key] = len(key) + 4 + NUM_WIDTH  # ,"clave":valor
+
+    def text(self, key, value):
+        width = len(key) + 6 + len(value)  # ,"clave":"valor"
+        if width > self._keys.get(key, 0):
+            self._keys[key] = width
+
+    def size(self):
+        return self._head + sum(self._keys.values()) + STAMP_SIZE + 1
@@ -0,0 +1,146 @@
+import json
+import time
+
+REPORT_FILE = "report.conf"
+DEFAULT_HEARTBEAT = 300  # Máximo silencio entre publicaciones (s)
+MAX_HEARTBEAT = 86400
+
+_MISSING = object()
+
+
+# Números de la configuración: true y false no valen como 1 y 0
+def _is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+class ReportPolicy:
+    """
+    Política de reporte por cambio.
+
+    Desactivada, se publica cada lectura como siempre. Activada, una lectura
+    se publica sólo si algún campo se alejó de su último valor publicado más
+    que su banda muerta, o si pasó el máximo silencio (heartbeat); y nunca
+    antes de min_spacing desde la publicación anterior. La banda de cada
+    campo es el mayor entre un valor absoluto y uno relativo (fracción del
+    último valor publicado); "*" fija la banda de los campos sin banda propia.
+
+    Los codificadores llaman a check() con cada campo que escriben. Se
+    configura por el tópico de comandos con:
+
+        {"report": {"deadband": {"temperature": 0.2, "humidity": {"rel": 0.02},
+                                 "*": 0}, "heartbeat": 300, "min_spacing": 10}}
+        {"report": "off"}
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.bands = {}  # clave (bytes) -> (absoluta, relativa)
+        self.default = (0, 0)
+        self.heartbeat = DEFAULT_HEARTBEAT
+        self.min_spacing = 0
+        self.changed = False
+        self._last = {}  # Último valor publicado de cada campo
+        self._current = {}  # Valores de la lectura en curso
+        self._last_publish = None
+
+    # Comienza una lectura
+    def begin(self):
+        self.changed = False
+
+    # Registra un campo de la lectura y si superó su banda muerta
+    def check(self, key, value):
+        self._current[key] = value
+        if self.changed or not self.enabled:
+            return
+        last = self._last.get(key, _MISSING)
+        if last is _MISSING or last is None or value is None:
+            self.changed = last is not value
+            return
+        band_abs, band_rel = self.bands.get(key, self.default)
+        if abs(value - last) > max(band_abs, band_rel * abs(last)):
+            self.changed = True
+
+    # Si la lectura en curso tiene que publicarse
+    def due(self, force=False):
+        if force or not self.enabled or self._last_publish is None:
+            return True
+        since = time.ticks_diff(time.ticks_ms(), self._last_publish)
+        if since < self.min_spacing * 1000:
+            return False
+        return self.changed or since >= self.heartbeat * 1000
+
+    # La lectura en curso se publicó: pasa a ser la referencia
+    def published(self):
+        self._last_publish = time.ticks_ms()
+        self._last.update(self._current)
+
+    # Aplica una configuración recibida por comando; False si no es válida
+    def configure(self, cfg):
+        if cfg == "off":
+            self.enabled = False
+            return True
+        if not isinstance(cfg, dict):
+            return False
+        heartbeat = cfg.get("heartbeat", self.heartbeat)
+        min_spacing = cfg.get("min_spacing", self.min_spacing)
+        if not (_is_int(heartbeat) and 1 <= heartbeat <= MAX_HEARTBEAT):
+            return False
+        if not (_is_int(min_spacing) and 0 <= min_spacing <= heartbeat):
+            return False
+        deadband = cfg.get("deadband", {})
+        if not isinstance(deadband, dict):
+            return False
+        bands = {}
+        default = self.default
+        for key, band in deadband.items():
+            if isinstance(band, dict):
+                band = (band.get("abs", 0), band.get("rel", 0))
+            else:
+                band = (band, 0)
+            if not all(_is_number(v) and v >= 0 for v in band):
+                return False
+            if key == "*":
+                default = band
+            else:
+                bands[key.encode()] = band
+        if "deadband" in cfg:
+            self.bands = bands
+            self.default = default
+        self.heartbeat = heartbeat
+        self.min_spacing = min_spacing
+        self.enabled = True
+        return True
+
+    # Configuración actual, para confirmarla y guardarla
+    def to_dict(self):
+        if not self.enabled:
+            return {"enabled": False}
+        deadband = {"*": {"abs": self.default[0], "rel": self.default[1]}}
+        for key, band in self.bands.items():
+            deadband[key.decode()] = {"abs": band[0], "rel": band[1]}
+        return {"enabled": True, "deadband": deadband,
+                "heartbeat": self.heartbeat, "min_spacing": self.min_spacing}
+
+    def load(self):
+        try:
+            with open(REPORT_FILE, 'r') as f:
+                cfg = json.loads(f.read())
+            if cfg.get("enabled") and self.configure(cfg):
+                print("Reporte por cambio activado:", cfg)
+        except OSError:
+            pass
+        except Exception as e:
+            print("Error cargando política de reporte:", e)
+
+    def save(self):
+        try:
+            with open(REPORT_FILE, 'w') as f:
+                f.write(json.dumps(self.to_dict()))
+            return True
+        except Exception as e:
+            print("Error guardando política de reporte:", e)
+            return False
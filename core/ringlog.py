@@ -0,0 +1,134 @@
+import struct
+import uos
+
+# Cabecera de cada registro: número de secuencia, largo del contenido y
+# verificación de ambos (una ranura vacía o a medio escribir no la cumple)
+_REC_HDR = "<IHH"
+RECORD_HEADER = 8
+# Índice: secuencia del registro más antiguo (head) y geometría del archivo
+_IDX = "<III"
+_IDX_SIZE = 12
+
+
+def _check(seq, size):
+    return (seq ^ (seq >> 16) ^ size ^ 0xA55A) & 0xFFFF
+
+
+class RingLog:
+    """
+    Cola persistente de registros de tamaño fijo en el sistema de archivos.
+
+    Los registros se escriben en ranuras de `record_size` bytes dentro de un
+    archivo de datos de `capacity` ranuras, que se reutilizan en forma
+    circular: el archivo nunca crece más allá de capacity * record_size. Las
+    secuencias head (registro más antiguo) y tail (próximo registro) sólo
+    crecen y la ranura de cada registro es su secuencia módulo capacity, así
+    las escrituras recorren todas las ranuras y cada una se reescribe una
+    vez por vuelta aunque la cola se vacíe.
+
+    Agregar un registro escribe sólo su ranura: cada ranura lleva su número
+    de secuencia, y al arrancar tail se reconstruye buscando la mayor
+    secuencia válida. El índice (12 bytes) guarda head y se reescribe sólo
+    al confirmar un lote enviado. Si la cola está llena se descarta el
+    registro más antiguo.
+    """
+
+    def __init__(self, name, record_size=512, capacity=512):
+        self.data_file = name + ".dat"
+        self.index_file = name + ".idx"
+        self.record_size = record_size
+        self.capacity = capacity
+        self.dropped = 0  # Registros descartados por desborde
+        self._hdr = bytearray(RECORD_HEADER)
+        self.head = self._load_index()
+        self.tail = self._scan()
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, "rb") as f:
+                head, record_size, capacity = struct.unpack(_IDX, f.read(_IDX_SIZE))
+            uos.stat(self.data_file)
+            if record_size == self.record_size and capacity == self.capacity:
+                return head
+            print("Cola con otro tamaño de ranura, se descarta")
+        except Exception:
+            pass
+        # Cola nueva (o de otra geometría): archivo de datos vacío
+        with open(self.data_file, "wb"):
+            pass
+        self.head = 0
+        self._save_index()
+        return 0
+
+    def _save_index(self):
+        with open(self.index_file, "wb") as f:
+            f.write(struct.pack(_IDX, self.head, self.record_size, self.capacity))
+
+    # Secuencia del registro de una ranura, o None si está vacía o dañada
+    def _read_header(self, f, slot):
+        f.seek(slot * self.record_size)
+        if f.readinto(self._hdr) != RECORD_HEADER:
+            return None
+        seq, size, check = struct.unpack(_REC_HDR, self._hdr)
+        if check != _check(seq, size) or seq % self.capacity != slot or \
+                size > self.record_size - RECORD_HEADER:
+            return None
+        return seq
+
+    # tail: la secuencia siguiente a la mayor encontrada en las ranuras
+    def _scan(self):
+        tail = self.head
+        with open(self.data_file, "rb") as f:
+            for slot in range(self.capacity):
+                seq = self._read_header(f, slot)
+                if seq is not None and seq >= tail:
+                    tail = seq + 1
+        # Desbordes ocurridos después de la última confirmación
+        if tail - self.head > self.capacity:
+            self.head = tail - self.capacity
+        return tail
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def append(self, payload):
+        """Agrega un registro al final de la cola. Devuelve False si no entra en una ranura."""
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if len(payload) > self.record_size - RECORD_HEADER:
+            print("Registro demasiado grande para la cola:", len(payload))
+            return False
+        seq = self.tail
+        struct.pack_into(_REC_HDR, self._hdr, 0, seq, len(payload), _check(seq, len(payload)))
+        with open(self.data_file, "r+b") as f:
+            f.seek((seq % self.capacity) * self.record_size)
+            f.write(self._hdr)
+            f.write(payload)
+        self.tail = seq + 1
+        if self.tail - self.head > self.capacity:
+            self.head = self.tail - self.capacity
+            self.dropped += 1
+        return True
+
+    def peek(self, count):
+        """Devuelve hasta `count` registros desde el más antiguo, sin quitarlos."""
+        records = []
+        seq = self.head
+        with open(self.data_file, "rb") as f:
+            while seq < self.tail and len(records) < count:
+                slot = seq % self.capacity
+                if self._read_header(f, slot) == seq:
+                    size = struct.unpack(_REC_HDR, self._hdr)[1]
+                    records.append(f.read(size))
+                else:
+                    # Ranura inconsistente (corte de energía durante la escritura)
+                    records.append(None)
+                seq += 1
+        return records
+
+    def commit(self, count):
+        """Quita los `count` registros más antiguos una vez enviados."""
+        if count <= 0:
+            return
+        self.head = min(self.head + count, self.tail)
+        self._save_index()
@@ -0,0 +1,123 @@
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+import time
+
+
+class Task:
+    """Tarea planificada: una función, su período (0 = una sola vez) y su próximo vencimiento."""
+
+    def __init__(self, name, fn, period, deadline):
+        self.name = name
+        self.fn = fn
+        self.period = period
+        self.deadline = deadline
+        self.overruns = 0  # Períodos salteados porque la tarea se atrasó
+        self.queued = False
+
+
+class Scheduler:
+    """
+    Planificador cooperativo de un solo hilo.
+
+    Las tareas se ordenan por vencimiento y se ejecutan de a una desde el
+    bucle de asyncio, nunca desde la interrupción de un Timer, por lo que no
+    compiten entre sí ni con la tarea de recepción MQTT por el socket. Las
+    tareas periódicas se reprograman respecto de su vencimiento anterior y no
+    del momento en que terminaron, así el período no deriva; si una tarea se
+    atrasa más de un período se saltean los vencimientos perdidos
+    conservando la fase.
+
+    Una tarea puede ser una función común o una corrutina (async def), que
+    se espera antes de pasar a la siguiente.
+    """
+
+    def __init__(self):
+        self._tasks = []  # Ordenadas por vencimiento
+        self._wake = asyncio.Event()
+
+    def _insert(self, task):
+        i = 0
+        n = len(self._tasks)
+        while i < n and time.ticks_diff(self._tasks[i].deadline, task.deadline) <= 0:
+            i += 1
+        self._tasks.insert(i, task)
+        task.queued = True
+        if i == 0:
+            # El próximo vencimiento cambió: despertar al bucle
+            self._wake.set()
+
+    def _remove(self, task):
+        if task.queued:
+            self._tasks.remove(task)
+            task.queued = False
+
+    def every(self, period_ms, fn, name=None, delay_ms=0):
+        """Ejecuta `fn` cada `period_ms`; la primera vez luego de `delay_ms`."""
+        task = Task(name, fn, period_ms, time.ticks_add(time.ticks_ms(), delay_ms))
+        self._insert(task)
+        return task
+
+    def once(self, delay_ms, fn, name=None):
+        """Ejecuta `fn` una sola vez luego de `delay_ms`."""
+        task = Task(name, fn, 0, time.ticks_add(time.ticks_ms(), delay_ms))
+        self._insert(task)
+        return task
+
+    def reschedule(self, task, period_ms=None, delay_ms=None):
+        """Cambia el período de una tarea y/o adelanta o atrasa su próximo vencimiento."""
+        if period_ms is not None:
+            task.period = period_ms
+        if delay_ms is None:
+            delay_ms = task.period
+        self._remove(task)
+        task.deadline = time.ticks_add(time.ticks_ms(), delay_ms)
+        self._insert(task)
+
+    def cancel(self, task):
+        self._remove(task)
+        task.period = 0
+
+    def spawn(self, coro):
+        """Lanza una tarea guiada por eventos (por ejemplo la recepción MQTT)."""
+        return asyncio.create_task(coro)
+
+    async def run(self):
+        while True:
+            if not self._tasks:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            task = self._tasks[0]
+            wait = time.ticks_diff(task.deadline, time.ticks_ms())
+            if wait > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for_ms(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._remove(task)
+            try:
+                res = task.fn()
+                if hasattr(res, "send"):
+                    await res
+            except Exception as e:
+                print("Error en la tarea", task.name, ":", e)
+
+            # Si la tarea no fue reprogramada mientras corría, calcular su
+            # próximo vencimiento a partir del anterior
+            if task.period and not task.queued:
+                deadline = time.ticks_add(task.deadline, task.period)
+                late = time.ticks_diff(time.ticks_ms(), deadline)
+                if late >= 0:
+                    missed = late // task.period + 1
+                    task.overruns += missed
+                    deadline = time.ticks_add(deadline, missed * task.period)
+                task.deadline = deadline
+                self._insert(task)
+
+            # Ceder el control a las tareas guiadas por eventos
+            await asyncio.sleep_ms(0)
@@ -0,0 +1,130 @@
+# Esquemas de la telemetría binaria (ver core/telemetry.py y tools/telemetry.py)
+#
+# Este módulo no importa nada propio de MicroPython: lo usan tanto los nodos
+# como el decodificador en CPython.
+#
+# Cada esquema: id -> (nombre, clave del código del nodo, campos), y cada
+# campo: (clave JSON, formato struct, decimales). El valor se envía como
+# entero escalado por 10**decimales. Las listas de campos sólo crecen al
+# final: así un mensaje de una versión anterior del firmware, más corto, se
+# sigue decodificando. Hasta 32 campos por esquema (máscaras de 32 bits).
+
+VERSION = 1  # Formato del encabezado
+
+SCHEMAS = {
+    1: ("consumption", "sensor_code", (
+        ("voltage", "H", 2),
+        ("current", "H", 2),
+        ("power", "I", 2),
+        ("energy", "I", 0),
+        ("frecuency", "H", 2),
+        ("power_factor", "H", 2),
+        ("nutrient_1_level", "H", 2),
+        ("nutrient_2_level", "H", 2),
+        ("nutrient_3_level", "H", 2),
+        ("nutrient_4_level", "H", 2),
+        ("nutrient_5_level", "H", 2),
+        ("nutrient_6_level", "H", 2),
+        ("voltage_min", "H", 2),
+        ("voltage_max", "H", 2),
+        ("voltage_std", "H", 2),
+        ("current_min", "H", 2),
+        ("current_max", "H", 2),
+        ("current_std", "H", 2),
+        ("power_min", "I", 2),
+        ("power_max", "I", 2),
+        ("power_std", "I", 2),
+        ("samples", "H", 0),
+        ("alarm", "B", 0),
+        ("power_threshold", "H", 0),
+        ("level_errors", "B", 0),
+        ("nutrient_1_litres", "I", 2),
+        ("nutrient_2_litres", "I", 2),
+        ("nutrient_3_litres", "I", 2),
+        ("nutrient_4_litres", "I", 2),
+        ("nutrient_5_litres", "I", 2),
+        ("nutrient_6_litres", "I", 2),
+    )),
+    2: ("environmental", "sensor_code", (
+        ("temperature", "h", 2),
+        ("humidity", "H", 2),
+        ("atmospheric_pressure", "I", 2),
+        ("luminosity", "I", 2),
+        ("co2", "H", 0),
+        ("temperature_min", "h", 2),
+        ("temperature_max", "h", 2),
+        ("temperature_std", "H", 2),
+        ("humidity_min", "H", 2),
+        ("humidity_max", "H", 2),
+        ("humidity_std", "H", 2),
+        ("atmospheric_pressure_min", "I", 2),
+        ("atmospheric_pressure_max", "I", 2),
+        ("atmospheric_pressure_std", "I", 2),
+        ("luminosity_min", "I", 2),
+        ("luminosity_max", "I", 2),
+        ("luminosity_std", "I", 2),
+        ("samples", "H", 0),
+        ("dew_point", "h", 2),
+        ("absolute_humidity", "H", 2),
+        ("luminosity_resolution", "H", 3),
+        ("luminosity_saturated", "B", 0),
+        ("warming_up", "B", 0),
+    )),
+    3: ("nutrient-solution", "sensor_code", (
+        ("temperature", "h", 2),
+        ("tds", "I", 2),
+        ("ph", "H", 2),
+        ("ce", "I", 2),
+        ("ec_mS", "I", 2),
+        ("ec_uS", "I", 2),
+        ("level", "H", 2),
+        ("ph_min", "H", 2),
+        ("ph_max", "H", 2),
+        ("ph_std", "H", 2),
+        ("ce_min", "I", 2),
+        ("ce_max", "I", 2),
+        ("ce_std", "I", 2),
+        ("ec_mS_min", "I", 2),
+        ("ec_mS_max", "I", 2),
+        ("ec_mS_std", "I", 2),
+        ("samples", "H", 0),
+    )),
+    4: ("actuator", "actuator_code", (
+        ("relay_water", "B", 0),
+        ("relay_aerator", "B", 0),
+        ("relay_vent", "B", 0),
+        ("relay_light", "B", 0),
+        ("relay_ph_plus", "B", 0),
+        ("relay_ph_minus", "B", 0),
+        ("relay_nutri_1", "B", 0),
+        ("relay_nutri_2", "B", 0),
+        ("relay_nutri_3", "B", 0),
+        ("relay_nutri_4", "B", 0),
+    )),
+}
+
+# Encabezado: versión, id de esquema, offset de zona horaria (minutos),
+# segundos desde 1970 (UTC), máscara de campos presentes y máscara de campos
+# nulos (None). Le siguen el largo y los bytes del código del nodo, y después
+# los campos en orden.
+HEADER = "<BBhIII"
+HEADER_SIZE = 16
+
+# Rango de cada formato (los valores fuera de rango se saturan)
+RANGES = {
+    "B": (0, 255),
+    "H": (0, 65535),
+    "h": (-32768, 32767),
+    "I": (0, 4294967295),
+    "i": (-2147483648, 2147483647),
+}
+
+SIZES = {"B": 1, "H": 2, "h": 2, "I": 4, "i": 4}
+
+
+# Id del esquema a partir de su nombre
+def schema_id(name):
+    for sid, schema in SCHEMAS.items():
+        if schema[0] == name:
+            return sid
+    raise ValueError("Esquema desconocido: " + name)
@@ -1,5 +1,7 @@
 import socket
 import struct
+import select
+import time
 from binascii import hexlify
 
 
@@ -17,6 +19,8 @@ class MQTTClient:
         password=None,
         keepalive=0,
         ssl=None,
+        window=0,
+        ack_timeout=5000,
     ):
         if port == 0:
             port = 8883 if ssl else 1883
@@ -34,10 +38,25 @@ class MQTTClient:
         self.lw_msg = None
         self.lw_qos = 0
         self.lw_retain = False
+        # QoS 1 in-flight window. With window=0 publish() blocks until the
+        # PUBACK arrives (one round trip per message); with window=N up to N
+        # publishes stay unacknowledged and are resent with DUP set when no
+        # PUBACK comes back within ack_timeout ms.
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.inflight = {}  # pid -> [sent ticks_ms, topic, msg, retain]
+
+    # All outgoing bytes go through _write() so subclasses working on a
+    # non-blocking socket can deal with partial writes in one place.
+    def _write(self, buf, n=None):
+        if n is None:
+            self.sock.write(buf)
+        else:
+            self.sock.write(buf, n)
 
     def _send_str(self, s):
-        self.sock.write(struct.pack("!H", len(s)))
-        self.sock.write(s)
+        self._write(struct.pack("!H", len(s)))
+        self._write(s)
 
     def _recv_len(self):
         n = 0
@@ -49,6 +68,11 @@ class MQTTClient:
                 return n
             sh += 7
 
+    def _next_pid(self):
+        # Packet identifiers are 16 bit and must never be 0
+        self.pid = self.pid % 65535 + 1
+        return self.pid
+
     def set_callback(self, f):
         self.cb = f
 
@@ -65,6 +89,11 @@ class MQTTClient:
         self.sock.settimeout(timeout)
         addr = socket.getaddrinfo(self.server, self.port)[0][-1]
         self.sock.connect(addr)
+        return self._session(clean_session)
+
+    # TLS (if configured) and the CONNECT/CONNACK exchange on a connected
+    # socket. Returns the session present flag.
+    def _session(self, clean_session):
         if self.ssl:
             self.sock = self.ssl.wrap_socket(self.sock, server_hostname=self.server)
         premsg = bytearray(b"\x10\0\0\0\0\0")
@@ -91,8 +120,8 @@ class MQTTClient:
             i += 1
         premsg[i] = sz
 
-        self.sock.write(premsg, i + 2)
-        self.sock.write(msg)
+        self._write(premsg, i + 2)
+        self._write(msg)
         # print(hex(len(msg)), hexlify(msg, ":"))
         self._send_str(self.client_id)
         if self.lw_topic:
@@ -108,15 +137,15 @@ class MQTTClient:
         return resp[2] & 1
 
     def disconnect(self):
-        self.sock.write(b"\xe0\0")
+        self._write(b"\xe0\0")
         self.sock.close()
 
     def ping(self):
-        self.sock.write(b"\xc0\0")
+        self._write(b"\xc0\0")
 
-    def publish(self, topic, msg, retain=False, qos=0):
+    def _send_publish(self, topic, msg, retain, qos, pid=0, dup=False):
         pkt = bytearray(b"\x30\0\0\0")
-        pkt[0] |= qos << 1 | retain
+        pkt[0] |= qos << 1 | retain | dup << 3
         sz = 2 + len(topic) + len(msg)
         if qos > 0:
             sz += 2
@@ -128,36 +157,73 @@ class MQTTClient:
             i += 1
         pkt[i] = sz
         # print(hex(len(pkt)), hexlify(pkt, ":"))
-        self.sock.write(pkt, i + 1)
+        self._write(pkt, i + 1)
         self._send_str(topic)
         if qos > 0:
-            self.pid += 1
-            pid = self.pid
             struct.pack_into("!H", pkt, 0, pid)
-            self.sock.write(pkt, 2)
-        self.sock.write(msg)
-        if qos == 1:
-            while 1:
-                op = self.wait_msg()
-                if op == 0x40:
-                    sz = self.sock.read(1)
-                    assert sz == b"\x02"
-                    rcv_pid = self.sock.read(2)
-                    rcv_pid = rcv_pid[0] << 8 | rcv_pid[1]
-                    if pid == rcv_pid:
-                        return
-        elif qos == 2:
+            self._write(pkt, 2)
+        self._write(msg)
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        if qos == 2:
             assert 0
+        if qos == 0:
+            self._send_publish(topic, msg, retain, 0)
+            return None
+        # Wait for room in the in-flight window (window=0 behaves as 1)
+        while len(self.inflight) >= (self.window or 1):
+            self._wait_ack()
+        pid = self._next_pid()
+        self._send_publish(topic, msg, retain, 1, pid)
+        self.inflight[pid] = [time.ticks_ms(), topic, msg, retain]
+        if not self.window:
+            while pid in self.inflight:
+                self._wait_ack()
+        return pid
+
+    # Resend, with the DUP flag, every in-flight publish whose PUBACK is
+    # overdue.
+    def _retransmit(self):
+        now = time.ticks_ms()
+        for pid, entry in self.inflight.items():
+            if time.ticks_diff(now, entry[0]) >= self.ack_timeout:
+                self._send_publish(entry[1], entry[2], entry[3], 1, pid, True)
+                entry[0] = now
+
+    # Process inbound packets until one arrives or the oldest PUBACK is
+    # overdue. Packets other than PUBLISH/PUBACK are skipped whole so the
+    # stream never falls out of sync.
+    def _wait_ack(self):
+        wait = self.ack_timeout
+        now = time.ticks_ms()
+        for entry in self.inflight.values():
+            wait = min(wait, self.ack_timeout - time.ticks_diff(now, entry[0]))
+        poller = select.poll()
+        poller.register(self.sock, select.POLLIN)
+        if poller.poll(max(0, wait)):
+            op = self.wait_msg()
+            if op is not None and op & 0xF0 not in (0x30, 0x40):
+                self.sock.read(self._recv_len())
+        self._retransmit()
+
+    # Block until every in-flight publish is acknowledged or timeout_ms
+    # elapses. Returns True when the window drained.
+    def flush(self, timeout_ms=None):
+        start = time.ticks_ms()
+        while self.inflight:
+            if timeout_ms is not None and time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+                return False
+            self._wait_ack()
+        return True
 
     def subscribe(self, topic, qos=0):
         assert self.cb is not None, "Subscribe callback is not set"
         pkt = bytearray(b"\x82\0\0\0")
-        self.pid += 1
-        struct.pack_into("!BH", pkt, 1, 2 + 2 + len(topic) + 1, self.pid)
+        struct.pack_into("!BH", pkt, 1, 2 + 2 + len(topic) + 1, self._next_pid())
         # print(hex(len(pkt)), hexlify(pkt, ":"))
-        self.sock.write(pkt)
+        self._write(pkt)
         self._send_str(topic)
-        self.sock.write(qos.to_bytes(1, "little"))
+        self._write(qos.to_bytes(1, "little"))
         while 1:
             op = self.wait_msg()
             if op == 0x90:
@@ -184,6 +250,12 @@ class MQTTClient:
             assert sz == 0
             return None
         op = res[0]
+        if op == 0x40:  # PUBACK
+            sz = self.sock.read(1)
+            assert sz == b"\x02"
+            rcv_pid = self.sock.read(2)
+            self.inflight.pop(rcv_pid[0] << 8 | rcv_pid[1], None)
+            return op
         if op & 0xF0 != 0x30:
             return op
         sz = self._recv_len()
@@ -200,7 +272,7 @@ class MQTTClient:
         if op & 6 == 2:
             pkt = bytearray(b"\x40\x02\0\0")
             struct.pack_into("!H", pkt, 2, pid)
-            self.sock.write(pkt)
+            self._write(pkt)
         elif op & 6 == 4:
             assert 0
         return op
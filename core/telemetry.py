@@ -0,0 +1,93 @@
+import struct
+from .schemas import SCHEMAS, VERSION, HEADER, HEADER_SIZE, RANGES, SIZES
+
+_SCALE = (1, 10, 100, 1000, 10000)
+
+
+class Telemetry:
+    """
+    Lectura en formato binario, con la misma interfaz que Payload.
+
+    El mensaje tiene un largo fijo por esquema: encabezado (versión, id de
+    esquema, zona horaria, hora y máscaras de campos presentes y nulos),
+    código del nodo y cada campo como entero escalado en su posición. Los
+    drivers escriben con num() igual que en JSON; un campo que no está en el
+    esquema se ignora. tools/telemetry.py lo convierte de vuelta al
+    diccionario JSON.
+    """
+
+    def __init__(self, schema, code):
+        self.schema = schema
+        fields = SCHEMAS[schema][2]
+        code = code.encode()
+        start = HEADER_SIZE + 1 + len(code)
+        size = start
+        for key, fmt, decimals in fields:
+            size += SIZES[fmt]
+        self.buf = bytearray(size)
+        self._mv = memoryview(self.buf)
+        self.buf[HEADER_SIZE] = len(code)
+        self.buf[HEADER_SIZE + 1:start] = code
+
+        # clave -> (bit, offset, formato, escala, mínimo, máximo)
+        self._fields = {}
+        offset = start
+        for bit, (key, fmt, decimals) in enumerate(fields):
+            lo, hi = RANGES[fmt]
+            self._fields[key.encode()] = (1 << bit, offset, "<" + fmt, _SCALE[decimals], lo, hi)
+            offset += SIZES[fmt]
+        self.mask = 0
+        self.nulls = 0
+        self.watch = None  # Recibe (clave, valor) de cada número (ver core/report.py)
+        self._tz = 0
+        self._time = 0
+
+    # Comienza un mensaje nuevo
+    def begin(self):
+        self.mask = 0
+        self.nulls = 0
+
+    # Posición actual, para descartar los campos de un driver con error
+    def mark(self):
+        return self.mask
+
+    def rewind(self, mark):
+        self.nulls &= mark
+        self.mask = mark
+
+    # Número escalado según el esquema (los decimales los fija el esquema)
+    def num(self, key, value, decimals=2):
+        if self.watch is not None:
+            self.watch(key, value)
+        field = self._fields.get(key)
+        if field is None:
+            return
+        bit, offset, fmt, scale, lo, hi = field
+        self.mask |= bit
+        if value is None:
+            self.nulls |= bit
+            return
+        if scale == 1 and isinstance(value, int):
+            v = value
+        else:
+            value *= scale
+            v = int(value - 0.5 if value < 0 else value + 0.5)
+        if v < lo:
+            v = lo
+        elif v > hi:
+            v = hi
+        struct.pack_into(fmt, self.buf, offset, v)
+
+    # Los textos no viajan en binario
+    def text(self, key, value):
+        pass
+
+    # Hora de la lectura: va en el encabezado
+    def stamp(self, clock, epoch=False):
+        self._tz = clock.offset // 60
+        self._time = clock.epoch()
+
+    # Mensaje terminado, listo para publicar
+    def view(self):
+        struct.pack_into(HEADER, self.buf, 0, VERSION, self.schema, self._tz, self._time, self.mask, self.nulls)
+        return self._mv
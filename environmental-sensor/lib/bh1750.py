@@ -2,7 +2,7 @@
 Micropython BH1750 ambient light sensor driver.
 """
 
-from utime import sleep_ms
+from utime import sleep_ms, ticks_ms, ticks_add, ticks_diff
 
 
 class BH1750():
@@ -20,11 +20,28 @@ class BH1750():
     ONCE_HIRES_2 = 0x21
     ONCE_LOWRES = 0x23
 
+    # measurement time register (MTreg), sensitivity = MTreg / 69
+    MTREG_MIN = 31
+    MTREG_DEFAULT = 69
+    MTREG_MAX = 254
+
+    # raw counts thresholds of the automatic range (see read())
+    SATURATED = 0xFFFF
+    HIGH_COUNTS = 50000  # above: shorter measurement time / less gain
+    LOW_COUNTS = 5000  # below: longer measurement time / more gain
+    TARGET_COUNTS = 20000
+
     # default addr=0x23 if addr pin floating or pulled to ground
     # addr=0x5c if addr pin pulled high
     def __init__(self, bus, addr=0x23):
         self.bus = bus
         self.addr = addr
+        self.mtreg = self.MTREG_DEFAULT
+        self.lux = None  # last reading of read()
+        self.resolution = None  # lux per count of the last reading
+        self.saturated = False
+        self._buf = bytearray(2)
+        self._ready = 0
         self.off()
         self.reset()
 
@@ -59,3 +76,56 @@ class BH1750():
         data = self.bus.readfrom(self.addr, 2)
         factor = 2.0 if mode in (0x11, 0x21) else 1.0
         return (data[0]<<8 | data[1]) / (1.2 * factor)
+
+    def start(self, mode=CONT_HIRES_2, mtreg=MTREG_DEFAULT):
+        """Start continuous measurement, to be sampled with read()."""
+        self.set_mode(mode)
+        self.set_mtreg(mtreg)
+
+    def set_mtreg(self, mtreg):
+        """Set the measurement time register (31..254, default 69)."""
+        mtreg = max(self.MTREG_MIN, min(self.MTREG_MAX, mtreg))
+        self.mtreg = mtreg
+        self.bus.writeto(self.addr, bytes([0x40 | mtreg >> 5]))
+        self.bus.writeto(self.addr, bytes([0x60 | mtreg & 0x1F]))
+        # the conversion in progress may still use the previous setting
+        self._ready = ticks_add(ticks_ms(), 2 * self.measurement_time())
+
+    def measurement_time(self):
+        """Max conversion time (ms) of the current mode and MTreg."""
+        base = 24 if self.mode in (0x13, 0x23) else 180
+        return base * self.mtreg // self.MTREG_DEFAULT + 1
+
+    def read(self):
+        """Latest luminance (in lux) of the continuous mode (see start()),
+        without waiting: until a conversion with the current settings is
+        done it returns the previous value (None at first).
+
+        The sensitivity follows the light: MTreg goes down (and the mode
+        from HIRES_2 to HIRES_1) when the counts get close to saturation,
+        and up when they get low. `resolution` is the lux per count and
+        `saturated` is set if the sensor was out of range even then.
+        """
+        if ticks_diff(ticks_ms(), self._ready) < 0:
+            return self.lux
+        self.bus.readfrom_into(self.addr, self._buf)
+        counts = self._buf[0] << 8 | self._buf[1]
+        factor = 2.0 if self.mode in (0x11, 0x21) else 1.0
+        self.resolution = self.MTREG_DEFAULT / (1.2 * factor * self.mtreg)
+        self.lux = counts * self.resolution
+        self.saturated = counts >= self.SATURATED
+        self._adapt(counts)
+        return self.lux
+
+    def _adapt(self, counts):
+        mtreg = self.mtreg
+        if counts > self.HIGH_COUNTS:
+            if mtreg > self.MTREG_MIN:
+                self.set_mtreg(mtreg * self.TARGET_COUNTS // counts)
+            elif self.mode == self.CONT_HIRES_2:
+                self.start(self.CONT_HIRES_1, mtreg)
+        elif counts < self.LOW_COUNTS:
+            if self.mode == self.CONT_HIRES_1:
+                self.start(self.CONT_HIRES_2, mtreg)
+            elif mtreg < self.MTREG_MAX:
+                self.set_mtreg(mtreg * self.TARGET_COUNTS // max(counts, 1))
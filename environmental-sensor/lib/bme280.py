@@ -15,6 +15,24 @@ BME280_OSAMPLE_16 = 5
 BME280_REGISTER_CONTROL_HUM = 0xF2
 BME280_REGISTER_STATUS = 0xF3
 BME280_REGISTER_CONTROL = 0xF4
+BME280_REGISTER_CONFIG = 0xF5
+
+# Standby time between measurements in normal mode
+BME280_STANDBY_0_5 = 0  # 0.5 ms
+BME280_STANDBY_62_5 = 1
+BME280_STANDBY_125 = 2
+BME280_STANDBY_250 = 3
+BME280_STANDBY_500 = 4
+BME280_STANDBY_1000 = 5
+BME280_STANDBY_10 = 6
+BME280_STANDBY_20 = 7
+
+# IIR filter coefficient
+BME280_FILTER_OFF = 0
+BME280_FILTER_2 = 1
+BME280_FILTER_4 = 2
+BME280_FILTER_8 = 3
+BME280_FILTER_16 = 4
 
 MODE_SLEEP = const(0)
 MODE_FORCED = const(1)
@@ -28,6 +46,7 @@ class BME280:
                  mode=BME280_OSAMPLE_8,
                  address=BME280_I2CADDR,
                  i2c=None,
+                 integer=False,
                  **kwargs):
         # Check that mode is valid.
         if type(mode) is tuple and len(mode) == 3:
@@ -75,6 +94,34 @@ class BME280:
         self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
                              self._l1_barray)
         self.t_fine = 0
+        self._normal = False
+        # Integer compensation (datasheet 4.2.3) instead of floats
+        self.integer = integer
+        # Last compensated reading: temperature, pressure, humidity
+        self.snapshot = array("f", [0, 0, 0])
+        self._have_snapshot = False
+
+    def normal_mode(self, standby=BME280_STANDBY_250, iir=BME280_FILTER_4):
+        """ Keeps the sensor measuring by itself (normal mode), with
+            `standby` between measurements and the on-chip IIR filter.
+            Each read is then a single burst of the last measurement,
+            with no trigger and no wait.
+        """
+        self._l1_barray[0] = self._mode_temp << 5 | self._mode_press << 2 | MODE_SLEEP
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
+                             self._l1_barray)
+        self._l1_barray[0] = standby << 5 | iir << 2
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONFIG,
+                             self._l1_barray)
+        self._l1_barray[0] = self._mode_hum
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM,
+                             self._l1_barray)
+        self._l1_barray[0] = self._mode_temp << 5 | self._mode_press << 2 | MODE_NORMAL
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
+                             self._l1_barray)
+        self._normal = True
+        # Wait for the first measurement (up to ~115 ms at 16x oversampling)
+        time.sleep_ms(120)
 
     def read_raw_data(self, result):
         """ Reads the raw (uncompensated) data from the sensor.
@@ -86,6 +133,25 @@ class BME280:
                 None
         """
 
+        if not self._normal:
+            self.measure_forced()
+
+        # burst readout from 0xF7 to 0xFE, recommended by datasheet
+        self.i2c.readfrom_mem_into(self.address, 0xF7, self._l8_barray)
+        readout = self._l8_barray
+        # pressure(0xF7): ((msb << 16) | (lsb << 8) | xlsb) >> 4
+        raw_press = ((readout[0] << 16) | (readout[1] << 8) | readout[2]) >> 4
+        # temperature(0xFA): ((msb << 16) | (lsb << 8) | xlsb) >> 4
+        raw_temp = ((readout[3] << 16) | (readout[4] << 8) | readout[5]) >> 4
+        # humidity(0xFD): (msb << 8) | lsb
+        raw_hum = (readout[6] << 8) | readout[7]
+
+        result[0] = raw_temp
+        result[1] = raw_press
+        result[2] = raw_hum
+
+    def measure_forced(self):
+        """ Triggers one measurement (forced mode) and waits for it. """
         self._l1_barray[0] = self._mode_hum
         self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM,
                              self._l1_barray)
@@ -102,19 +168,48 @@ class BME280:
         else:
             raise RuntimeError("Sensor BME280 not ready")
 
-        # burst readout from 0xF7 to 0xFE, recommended by datasheet
-        self.i2c.readfrom_mem_into(self.address, 0xF7, self._l8_barray)
-        readout = self._l8_barray
-        # pressure(0xF7): ((msb << 16) | (lsb << 8) | xlsb) >> 4
-        raw_press = ((readout[0] << 16) | (readout[1] << 8) | readout[2]) >> 4
-        # temperature(0xFA): ((msb << 16) | (lsb << 8) | xlsb) >> 4
-        raw_temp = ((readout[3] << 16) | (readout[4] << 8) | readout[5]) >> 4
-        # humidity(0xFD): (msb << 8) | lsb
-        raw_hum = (readout[6] << 8) | readout[7]
+    def compensate_int(self, raw_temp, raw_press, raw_hum, result):
+        """ Integer compensation from the datasheet (4.2.3): 32 bit for
+            temperature & humidity, 64 bit for pressure.
 
-        result[0] = raw_temp
-        result[1] = raw_press
-        result[2] = raw_hum
+            Args:
+                result: array of length 3 or alike where the result will be
+                stored: temperature in 0.01 C, pressure in Pa as Q24.8
+                (Pa * 256) and humidity in %RH as Q22.10 (%RH * 1024)
+        """
+        # temperature
+        var1 = (((raw_temp >> 3) - (self.dig_T1 << 1)) * self.dig_T2) >> 11
+        var2 = (raw_temp >> 4) - self.dig_T1
+        var2 = (((var2 * var2) >> 12) * self.dig_T3) >> 14
+        self.t_fine = var1 + var2
+        result[0] = (self.t_fine * 5 + 128) >> 8
+
+        # pressure
+        var1 = self.t_fine - 128000
+        var2 = var1 * var1 * self.dig_P6
+        var2 = var2 + ((var1 * self.dig_P5) << 17)
+        var2 = var2 + (self.dig_P4 << 35)
+        var1 = ((var1 * var1 * self.dig_P3) >> 8) + ((var1 * self.dig_P2) << 12)
+        var1 = (((1 << 47) + var1) * self.dig_P1) >> 33
+        if var1 == 0:
+            result[1] = 30000 << 8  # avoid exception caused by division by zero
+        else:
+            p = 1048576 - raw_press
+            p = (((p << 31) - var2) * 3125) // var1
+            var1 = (self.dig_P9 * (p >> 13) * (p >> 13)) >> 25
+            var2 = (self.dig_P8 * p) >> 19
+            result[1] = ((p + var1 + var2) >> 8) + (self.dig_P7 << 4)
+
+        # humidity
+        h = self.t_fine - 76800
+        h = ((((raw_hum << 14) - (self.dig_H4 << 20) - (self.dig_H5 * h)) +
+              16384) >> 15) * (((((((h * self.dig_H6) >> 10) *
+                                   (((h * self.dig_H3) >> 11) + 32768)) >> 10) +
+                                 2097152) * self.dig_H2 + 8192) >> 14)
+        h = h - (((((h >> 15) * (h >> 15)) >> 7) * self.dig_H1) >> 4)
+        h = max(0, min(419430400, h))
+        result[2] = h >> 12
+        return result
 
     def read_compensated_data(self, result=None):
         """ Reads the data from the sensor and returns the compensated data.
@@ -130,6 +225,12 @@ class BME280:
         """
         self.read_raw_data(self._l3_resultarray)
         raw_temp, raw_press, raw_hum = self._l3_resultarray
+        if self.integer:
+            self.compensate_int(raw_temp, raw_press, raw_hum, self._l3_resultarray)
+            return self._store(max(-40, min(85, self._l3_resultarray[0] / 100)),
+                               max(30000, min(110000, self._l3_resultarray[1] / 256)),
+                               min(100, self._l3_resultarray[2] / 1024), result)
+
         # temperature
         var1 = (raw_temp/16384.0 - self.dig_T1/1024.0) * self.dig_T2
         var2 = raw_temp/131072.0 - self.dig_T1/8192.0
@@ -164,6 +265,16 @@ class BME280:
         if (humidity > 100):
             humidity = 100.0
 
+        return self._store(temp, pressure, humidity, result)
+
+    def _store(self, temp, pressure, humidity, result):
+        # Keep the reading for the derived values (altitude, dew point...)
+        snapshot = self.snapshot
+        snapshot[0] = temp
+        snapshot[1] = pressure
+        snapshot[2] = humidity
+        self._have_snapshot = True
+
         if result:
             result[0] = temp
             result[1] = pressure
@@ -172,6 +283,12 @@ class BME280:
 
         return array("f", (temp, pressure, humidity))
 
+    def _last(self):
+        # Last reading; reads the sensor only if there is none yet
+        if not self._have_snapshot:
+            self.read_compensated_data()
+        return self.snapshot
+
     @property
     def sealevel(self):
         return self.__sealevel
@@ -184,11 +301,11 @@ class BME280:
     @property
     def altitude(self):
         '''
-        Altitude in m.
+        Altitude in m, from the last reading.
         '''
         from math import pow
         try:
-            p = 44330 * (1.0 - pow(self.read_compensated_data()[1] /
+            p = 44330 * (1.0 - pow(self._last()[1] /
                                    self.__sealevel, 0.1903))
         except:
             p = 0.0
@@ -197,14 +314,26 @@ class BME280:
     @property
     def dew_point(self):
         """
-        Compute the dew point temperature for the current Temperature
+        Compute the dew point temperature for the last Temperature
         and Humidity measured pair
         """
         from math import log
-        t, p, h = self.read_compensated_data()
+        t, p, h = self._last()
+        if h <= 0:
+            return None
         h = (log(h, 10) - 2) / 0.4343 + (17.62 * t) / (243.12 + t)
         return 243.12 * h / (17.62 - h)
 
+    @property
+    def absolute_humidity(self):
+        """
+        Absolute humidity in g/m3 for the last Temperature and Humidity
+        measured pair
+        """
+        from math import exp
+        t, p, h = self._last()
+        return 6.112 * exp(17.67 * t / (t + 243.5)) * h * 2.1674 / (273.15 + t)
+
     @property
     def values(self):
         """ human readable values """
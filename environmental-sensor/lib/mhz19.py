@@ -2,14 +2,56 @@ from machine import UART
 import time
 import sys
 
+# Read CO2 command (0x86), checksum included
+READ_CMD = b"\xff\x01\x86\x00\x00\x00\x00\x00\x79"
+
+# Commands (datasheet): read, ABC on/off, detection range, zero & span
+CMD_READ = 0x86
+CMD_ABC = 0x79
+CMD_RANGE = 0x99
+CMD_ZERO = 0x87
+CMD_SPAN = 0x88
+
+RANGES = (2000, 5000, 10000)
+
+# Reply commands recognised by the frame reader
+REPLIES = (CMD_READ, CMD_ABC, CMD_RANGE, CMD_ZERO, CMD_SPAN)
+
+RING_SIZE = 32  # Power of 2
+RING_MASK = RING_SIZE - 1
+
 
 class MHZ19:
+    # Warm-up: the readings are stable after STABLE_READINGS valid ones in
+    # a row, WARMUP_INTERVAL ms apart, or after WARMUP_MAX ms (datasheet)
+    WARMUP_MAX = 180000
+    WARMUP_INTERVAL = 5000
+    STABLE_READINGS = 3
+    VALID_MIN = 400
+    VALID_MAX = 5000
+
     def __init__(self,  uart_no):
         self.uart_no = uart_no
         self.start()
-        self.ppm = 0
+        self.ppm = None  # Until the first reply
+        self.measured_at = None  # ticks_ms when `ppm` was received
         self.temp = 0
         self.co2status = 0
+        self.crc_errors = 0
+        # Received bytes (ring buffer) and UART chunk, allocated once
+        self._ring = bytearray(RING_SIZE)
+        self._head = 0
+        self._count = 0
+        self._chunk = bytearray(RING_SIZE)
+        self._tx = bytearray(9)
+        # Last reply to a command other than read (see send_command)
+        self.reply = bytearray(9)
+        self.reply_cmd = None
+        # The sensor heats up from power on, while the node connects
+        self.warming_up = True
+        self.powered_at = time.ticks_ms()
+        self.stable_readings = 0
+        self.last_check = None
 
     def start(self):
         self.uart = UART(self.uart_no, 9600)
@@ -21,40 +63,157 @@ class MHZ19:
         self.uart.deinit()
 
     def get_data(self):
-        self.uart.write(b"\xff\x01\x86\x00\x00\x00\x00\x00\x79")
-        time.sleep(0.1)
-        s = self.uart.read(9)
-        try:
-            z = bytearray(s)
-        except:
-            return 0
-        # Calculate crc
-        crc = self.crc8(s)
-        if crc != z[8]:
-            # we should restart the uart comm here..
-            self.stop()
-            time.sleep(1)
-            self.start()
-
-            print('CRC error calculated %d bytes= %d:%d:%d:%d:%d:%d:%d:%d crc= %dn' % (
-                crc, z[0], z[1], z[2], z[3], z[4], z[5], z[6], z[7], z[8]))
-            return 0
-        else:
-            self.ppm = ord(chr(s[2])) * 256 + ord(chr(s[3]))
-            self.temp = ord(chr(s[4])) - 40
-            self.co2status = ord(chr(s[5]))
+        """Decode the reply to the previous read request and send a new one.
+
+        Never waits: the reply arrives in ~10 ms and is taken on the next
+        call (or by poll()), so `ppm` is as old as the period between
+        calls. Call it every few seconds from a background task & check
+        fresh() before using `ppm`. Returns 1 if a new reading was decoded,
+        else 0.
+        """
+        fresh = self.poll()
+        self.uart.write(READ_CMD)
+        return fresh
+
+    def fresh(self, max_age):
+        """
+        Returns:
+            (bool): return true if `ppm` was received in the last max_age ms
+        """
+        t = self.measured_at
+        return t is not None and time.ticks_diff(time.ticks_ms(), t) < max_age
+
+    def poll(self):
+        """Move the received bytes to the ring buffer and decode the
+        complete frames (see _frame). A new reading advances the warm-up.
+        Returns 1 if a reading was decoded.
+        """
+        uart = self.uart
+        ring = self._ring
+        n = uart.any()
+        while n:
+            got = uart.readinto(self._chunk, min(n, RING_SIZE))
+            if not got:
+                break
+            for k in range(got):
+                if self._count == RING_SIZE:
+                    # Full: drop the oldest byte
+                    self._head = (self._head + 1) & RING_MASK
+                    self._count -= 1
+                ring[(self._head + self._count) & RING_MASK] = self._chunk[k]
+                self._count += 1
+            n = uart.any()
+
+        fresh = 0
+        while self._count >= 9:
+            head = self._head
+            # Header 0xFF + a known reply command, then the checksum of
+            # bytes 1 to 7 (in place in the ring)
+            if ring[head] != 0xFF or ring[(head + 1) & RING_MASK] not in REPLIES:
+                self._drop(1)
+                continue
+            crc = 0
+            for k in range(1, 8):
+                crc += ring[(head + k) & RING_MASK]
+            if (0xFF - (crc & 0xFF) + 1) & 0xFF != ring[(head + 8) & RING_MASK]:
+                # Misaligned or corrupted: look for the next header
+                self.crc_errors += 1
+                self._drop(1)
+                continue
+            if self._frame(head):
+                fresh = 1
+            self._drop(9)
+        if fresh:
+            self.warmup_step()
+        return fresh
+
+    def _frame(self, head):
+        # Decode a valid frame that starts at `head` in the ring
+        ring = self._ring
+        cmd = ring[(head + 1) & RING_MASK]
+        if cmd == CMD_READ:
+            self.ppm = ring[(head + 2) & RING_MASK] * 256 + ring[(head + 3) & RING_MASK]
+            self.temp = ring[(head + 4) & RING_MASK] - 40
+            self.co2status = ring[(head + 5) & RING_MASK]
+            self.measured_at = time.ticks_ms()
             return 1
+        for k in range(9):
+            self.reply[k] = ring[(head + k) & RING_MASK]
+        self.reply_cmd = cmd
+        return 0
+
+    def send_command(self, cmd, b3=0, b4=0, b5=0, b6=0, b7=0):
+        """Send a command frame (FF 01 cmd b3..b7 checksum). Its reply, if
+        the sensor sends one (not every model does), is taken by poll() in
+        `reply` / `reply_cmd`.
+        """
+        tx = self._tx
+        tx[0] = 0xFF
+        tx[1] = 0x01
+        tx[2] = cmd
+        tx[3] = b3
+        tx[4] = b4
+        tx[5] = b5
+        tx[6] = b6
+        tx[7] = b7
+        tx[8] = self.crc8(tx)
+        if self.reply_cmd == cmd:
+            self.reply_cmd = None
+        self.uart.write(tx)
+
+    def set_abc(self, on):
+        """Automatic baseline correction (every 24 h) on or off."""
+        self.send_command(CMD_ABC, 0xA0 if on else 0x00)
+
+    def set_range(self, ppm):
+        """Detection range: 2000, 5000 or 10000 ppm."""
+        if ppm not in RANGES:
+            raise ValueError("Rango inválido: {}".format(ppm))
+        self.send_command(CMD_RANGE, b6=ppm >> 8, b7=ppm & 0xFF)
+
+    def zero_calibration(self):
+        """Zero point (400 ppm). The sensor must have been in fresh air
+        for at least 20 minutes."""
+        self.send_command(CMD_ZERO)
+
+    def span_calibration(self, ppm):
+        """Span point at `ppm` (after the zero calibration)."""
+        self.send_command(CMD_SPAN, ppm >> 8, ppm & 0xFF)
+
+    def _drop(self, n):
+        self._head = (self._head + n) & RING_MASK
+        self._count -= n
+
+    def warmup_step(self):
+        """Advance the warm-up with the last reading (see poll)."""
+        if not self.warming_up:
+            return
+        now = time.ticks_ms()
+        elapsed = time.ticks_diff(now, self.powered_at)
+        if elapsed >= self.WARMUP_MAX:
+            self.warming_up = False
+            print("MH-Z19C iniciado por timeout ({}s)".format(self.WARMUP_MAX // 1000))
+            return
+        if self.last_check is not None and \
+                time.ticks_diff(now, self.last_check) < self.WARMUP_INTERVAL:
+            return
+        self.last_check = now
+        if self.ppm is not None and self.VALID_MIN <= self.ppm <= self.VALID_MAX:
+            self.stable_readings += 1
+            if self.stable_readings >= self.STABLE_READINGS:
+                self.warming_up = False
+                print("MH-Z19C listo en {:.1f} segundos (PPM estable: {})".format(
+                    elapsed / 1000, self.ppm))
+        else:
+            self.stable_readings = 0
 
     def crc8(self, a):
         crc = 0x00
         count = 1
-        b = bytearray(a)
         while count < 8:
-            crc += b[count]
+            crc += a[count]
             count = count+1
         # Truncate to 8 bit
         crc %= 256
-        # Invert number with xor
-        crc = ~crc & 0xFF
-        crc += 1
-        return crc
+        # Two's complement, truncated to 8 bit (a sum of 0 gives 0, not 256)
+        return (~crc + 1) & 0xFF
@@ -1,46 +1,33 @@
-from machine import Pin, SoftI2C, Timer, reset
-from lib.wifi_manager import WifiManager
+# Perfil de arranque (ver core/bootprof.py): va antes de los demás imports
+from core import bootprof
+bootprof.start()
+
+from machine import Pin, SoftI2C
 import lib.bme280 as bme280
 import lib.bh1750 as bh1750
 import lib.mhz19 as mhz19
-from lib.robust import MQTTClient
+from lib.mhz19 import CMD_ABC, CMD_RANGE, CMD_ZERO, CMD_SPAN
+from core.node import Node
 import config
-import ntptime
-import ssl
-import time
-import uos
-import gc
-import sys
+import binascii
 import json
+import gc
 
-# Configuración inicial
-CONFIG_FILE = "interval.conf"
-WIFI_FILE = "wifi.dat"
-TIMEZONE_FILE = "timezone.conf"
-DEFAULT_INTERVAL = 5
-sensor_interval = DEFAULT_INTERVAL
-sensor_data = {}  # Diccionario para datos de sensores
-wm = WifiManager()
-
-# Variables globales
-wlan = None
-wifi_connected = False
-last_led_toggle = time.ticks_ms()
-led_state = False
-mqtt_client = None
-last_wifi_check = 0
-WIFI_CHECK_INTERVAL = 10000  # 10 segundos
-
-# Configurar botón BOOT (GPIO0) con pull-up
-boot_button = Pin(0, Pin.IN, Pin.PULL_UP)
-led = Pin(2, Pin.OUT) # LED azul en GPIO2 (común en ESP32)
+CO2_FILE = "mhz19.conf"  # Configuración del MH-Z19 (ABC y rango)
+CO2_REPLY_WAIT = 300  # Espera de la respuesta del sensor a un comando (ms)
+CO2_POLL_INTERVAL = 2000  # Pedido de lectura al MH-Z19 en segundo plano (ms)
+CO2_MAX_AGE = 3 * CO2_POLL_INTERVAL  # Una lectura más vieja se publica como null (ms)
 
 # Inicialización de sensores
 
 # BME280 en I2C (SCL=19, SDA=18)
 try:
     i2c_bme280 = SoftI2C(scl=Pin(19), sda=Pin(18), freq=400000)
-    bme280 = bme280.BME280(i2c=i2c_bme280)
+    # Modo normal: mide solo cada 250 ms con el filtro IIR del sensor;
+    # cada lectura es una ráfaga I2C sin esperas. Compensación entera
+    # (más precisa que los float de simple precisión del ESP32)
+    bme280 = bme280.BME280(i2c=i2c_bme280, integer=True)
+    bme280.normal_mode()
 except Exception as e:
     print("¡Error crítico detectado en i2c_bme280!")
     print("Detalles del error:", str(e))
@@ -49,452 +36,150 @@ except Exception as e:
 try:
     i2c_bh1750 = SoftI2C(scl=Pin(22), sda=Pin(21), freq=400000)
     bh1750 = bh1750.BH1750(i2c_bh1750)
+    # Modo continuo: cada lectura toma la última conversión sin esperar y
+    # el tiempo de medición (MTreg) se ajusta solo a la luz
+    bh1750.start()
 except Exception as e:
     print("¡Error crítico detectado en i2c_bh1750!")
     print("Detalles del error:", str(e))
 
-# MH-Z19 en UART2 (TX=17, RX=16)
+# MH-Z19 en UART2 (TX=17, RX=16). El precalentamiento (hasta 3 minutos
+# según datasheet) sigue en el driver mientras el nodo se conecta; hasta
+# que las lecturas se estabilizan el CO2 se publica con warming_up = 1
 try:
     mhz19 = mhz19.MHZ19(2)
-    mhz19_ready = False
-    start_time = time.time()
-    max_warmup = 180  # Máximo 3 minutos según datasheet
-    stable_readings = 0
-    required_stable = 3  # Número de lecturas estables consecutivas
-    
-    print("Iniciando verificación MH-Z19C...")
-    
-    while not mhz19_ready and (time.time() - start_time) < max_warmup:
-        try:
-            # Intentar lectura
-            mhz19.get_data()
-            ppm = mhz19.ppm
-            elapsed = time.time() - start_time
-            
-            # Evaluar validez de la lectura
-            if 400 <= ppm <= 5000:  # Rango válido según datasheet
-                stable_readings += 1
-                print(f"\rLectura estable {stable_readings}/{required_stable} | PPM: {ppm} | {elapsed:.0f}s", end='')
-                
-                if stable_readings >= required_stable:
-                    mhz19_ready = True
-                    print(f"\nMH-Z19C listo en {elapsed:.1f} segundos (PPM estable: {ppm})")
-            else:
-                stable_readings = 0  # Resetear contador si lectura no válida
-                print(f"\rLectura inválida: {ppm} PPM | {elapsed:.0f}s", end='')
-            
-            time.sleep(5)  # Intervalo entre lecturas de verificación
-            
-        except Exception as e:
-            print(f"\nError en verificación: {str(e)[:50]}...")
-            time.sleep(10)
-    
-    if not mhz19_ready:
-        print(f"\nMH-Z19C iniciado por timeout ({max_warmup}s)")
-        mhz19_ready = True  # Forzar continuar después del tiempo máximo
-
+    print("Sensor MH-Z19C inicializado, precalentando")
 except Exception as e:
     print("\n¡Error crítico en MH-Z19C!")
     print("Detalles:", str(e))
     mhz19 = None
     
-# Liberamos la memoria
-gc.collect()
+# Método para cargar la configuración del MH-Z19 y aplicarla al sensor
+def load_co2_settings():
+    try:
+        with open(CO2_FILE, 'r') as f:
+            settings = json.loads(f.read())
+        if mhz19:
+            if "abc" in settings:
+                mhz19.set_abc(settings["abc"])
+            if "range" in settings:
+                mhz19.set_range(settings["range"])
+            print("Configuración del MH-Z19 aplicada:", settings)
+        return settings
+    except OSError:
+        return {}
+    except Exception as e:
+        print("Error cargando configuración del MH-Z19:", e)
+        return {}
 
-# Método para conectar Wi-Fi con mejor manejo de errores
-def connect_wifi():
-    global wifi_connected
+# Método para guardar la configuración del MH-Z19
+def save_co2_settings():
     try:
-        if not wm.is_connected():
-            print("Intentando conectar red Wi-Fi...")
-            wlan = wm.connect()
-            if wm.is_connected():
-                wifi_connected = True
-                led.on()
-                return True  
-        wifi_connected = False
-        led.off()
-        return False
+        with open(CO2_FILE, 'w') as f:
+            f.write(json.dumps(co2_settings))
+        return True
     except Exception as e:
-        print("Error en la conexión de Wi-Fi:", e)
-        wifi_connected = False
-        led.off()
+        print("Error guardando configuración del MH-Z19:", e)
         return False
 
-# Método para verificar estado del WiFi
-def check_wifi_connection():
-    
-    global wifi_connected, last_wifi_check
-    current_time = time.ticks_ms()
-    
-    if time.ticks_diff(current_time, last_wifi_check) > WIFI_CHECK_INTERVAL:
-        last_wifi_check = current_time
-        
-        if not wm.is_connected():
-            print("Wi-Fi desconectado. Intentando reconectar...")
-            if connect_wifi():
-                wifi_connected = True
-                return True
-            else:
-                wifi_connected = False
-                return False
-        
-        wifi_connected = True
-    return wifi_connected
-
-# Método para sincronizar tiempo con NTP
-def sync_time(max_retries=5):
-    for i in range(max_retries):
-        try:
-            print(f"Intentando sincronizar hora (intento {i+1}/{max_retries})...")
-            ntptime.host = "time.google.com"  # Servidor alternativo
-            ntptime.settime()
-            print("Hora sincronizada:", time.localtime())
-            return True
-        except OSError as e:
-            print("Error sincronizando hora:", e)
-            time.sleep(2)
-    print("Error: No se pudo sincronizar la hora después de", max_retries, "intentos")
-    return False
-
-# Carga de certificados
-try:
-    print("Cargando certificados...")
-    with open("aws/client.key", "rb") as f:
-        CLIENT_KEY = f.read()
-    with open("aws/client.crt", "rb") as f:
-        CLIENT_CRT = f.read()
-    with open("aws/root.crt", "rb") as f:
-        ROOT_CRT = f.read()
-    print("Certificados cargados correctamente")
-except Exception as e:
-    print("Error cargando certificados:", e)
-    raise
-
-#Leer la zona horaria desde el archivo de configuración
-#TIMEZONE_FILE = "timezone.conf"
-try:
-    with open(TIMEZONE_FILE, 'r') as f:
-        TIMEZONE = f.read().strip()
-        print("Zona horaria configurada:", TIMEZONE)
-except Exception as e:
-    print("Error leyendo zona horaria:", e)
-    raise
+co2_settings = load_co2_settings()
 
 # Liberamos la memoria
 gc.collect()
 
-# Configuración de conexión MQTT
-try:
-    print("Configurando SSL...")
-    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-    context.verify_mode = ssl.CERT_REQUIRED
-    context.load_cert_chain(CLIENT_CRT, CLIENT_KEY)
-    context.load_verify_locations(cadata=ROOT_CRT)
-    print("SSL configurado correctamente")
-except Exception as e:
-    print("Error configurando SSL:", e)
-    raise
-
-# Creación de cliente MQTT
-try:
-    print("Creando cliente MQTT...")
-    mqtt_client = MQTTClient(
-        client_id=config.AWS_CLIENT_ID,
-        server=config.AWS_ENDPOINT,
-        port=8883,
-        keepalive=5000,
-        ssl=context,
-    )
-    print("Cliente MQTT creado")
-except Exception as e:
-    print("Error creando cliente MQTT:", e)
-    raise
-
-# Callback para mensajes entrantes (Seteo de nuevo intervalo y lectura inmediata)
-def subscription_cb(topic, message):
-    print("\nMensaje recibido:")
-    print("Tópico:", topic.decode("utf-8"))
-    print("Mensaje:", message.decode("utf-8"))
-    print("-------------------")
-    
+# Leer BME280
+def read_bme280(p):
+    temp, press, hum = bme280.read_compensated_data()
+    p.num(b"temperature", temp, 2)
+    p.num(b"humidity", hum, 2)
+    p.num(b"dew_point", bme280.dew_point, 2)
+    p.num(b"absolute_humidity", bme280.absolute_humidity, 2)
+    p.num(b"atmospheric_pressure", press / 100, 2)
+
+# Leer BH1750
+def read_bh1750(p):
+    lux = bh1750.read()
+    p.num(b"luminosity", lux, 2)
+    p.num(b"luminosity_resolution", bh1750.resolution, 3)
+    p.num(b"luminosity_saturated", 1 if bh1750.saturated else 0, 0)
+
+# Leer MH-Z19. El CO2 lo pide al sensor una tarea cada CO2_POLL_INTERVAL:
+# aquí se toma la última respuesta, si es reciente
+def read_co2(p):
+    mhz19.poll()
+    p.num(b"co2", mhz19.ppm if mhz19.fresh(CO2_MAX_AGE) else None, 0)
+    p.num(b"warming_up", 1 if mhz19.warming_up else 0, 0)
+
+# Método para manejar comandos del MH-Z19:
+#   {"co2": {"abc": true}}                      corrección automática de línea base
+#   {"co2": {"range": 5000}}                    rango de detección (2000, 5000, 10000)
+#   {"co2": {"calibrate": "zero"}}              punto cero (20 min al aire libre antes)
+#   {"co2": {"calibrate": "span", "ppm": 2000}} punto de span
+def handle_co2_command(cmd):
+    if not mhz19 or not isinstance(cmd, dict):
+        node.respond({"co2": "ERROR", "error": "Comando o sensor no disponible"})
+        return
     try:
-        msg = json.loads(message.decode("utf-8"))
-        
-        # Verificar si el mensaje es para este sensor
-        if msg.get("sensor_code") != config.SENSOR_CODE:
-            print("Mensaje no destinado a este sensor")
+        if "abc" in cmd:
+            abc = cmd["abc"]
+            if not isinstance(abc, bool):
+                node.respond({"co2": "ERROR", "error": "abc debe ser true o false"})
+                return
+            mhz19.set_abc(abc)
+            co2_settings["abc"] = abc
+            save_co2_settings()
+            sent = {"abc": abc}
+            code = CMD_ABC
+        elif "range" in cmd:
+            mhz19.set_range(cmd["range"])
+            co2_settings["range"] = cmd["range"]
+            save_co2_settings()
+            sent = {"range": cmd["range"]}
+            code = CMD_RANGE
+        elif cmd.get("calibrate") == "zero":
+            mhz19.zero_calibration()
+            sent = {"calibrate": "zero"}
+            code = CMD_ZERO
+        elif cmd.get("calibrate") == "span" and isinstance(cmd.get("ppm"), int) and 1000 <= cmd["ppm"] <= 10000:
+            mhz19.span_calibration(cmd["ppm"])
+            sent = {"calibrate": "span", "ppm": cmd["ppm"]}
+            code = CMD_SPAN
+        else:
+            node.respond({"co2": "ERROR", "error": "Comando inválido"})
             return
-        
-        # Comando para lectura inmediata
-        if msg.get("command") == "read_now":
-            print("Comando de lectura inmediata recibido")
-            
-            # Enviar confirmación
-            response = {
-                "sensor_code": config.SENSOR_CODE,
-                "command": "read_now_ack",
-                "status": "received"
-            }
-            mqtt_client.publish(config.AWS_TOPIC_SUB, json.dumps(response), qos=0)
-            print("Confirmación de lectura enviada al servidor")
-            
-            # Ejecutar lectura inmediata
-            leer_sensores()
-            
-        # Comando para lectura inmediata
-        if msg.get("command") == "read_now_ack":
-            pass
-        
-        # Cambio de intervalo
-        elif "interval" in msg:
-            new_interval = msg.get("interval")
-            
-            # Validar intervalo
-            if isinstance(new_interval, int) and 1 <= new_interval <= 86400:
-                global sensor_interval, timer
-                
-                # Actualizar y guardar intervalo
-                sensor_interval = new_interval
-                if save_interval(sensor_interval):
-                    # Reconfigurar timer
-                    timer.deinit()
-                    timer.init(period=sensor_interval*1000, mode=Timer.PERIODIC, callback=lambda t: leer_sensores())
-                    print("Intervalo actualizado:", sensor_interval)
-                    
-                    # Enviar confirmación
-                    response = {
-                        "sensor_code": config.SENSOR_CODE,
-                        "interval": "OK",
-                        "seconds_to_report": sensor_interval
-                    }
-                    mqtt_client.publish(config.AWS_TOPIC_SUB, json.dumps(response), qos=0)
-                    print("Confirmación enviada al servidor")
-        
-        # Comando no reconocido
-        #else:
-        #    print("Comando no reconocido en el mensaje", msg)
-                
-    except Exception as e:
-        print("Error procesando mensaje:", e)
-        
-    # Liberamos la memoria
-    gc.collect()
-
-# Método para reiniciar el dispositivo 
-def check_boot_button():
-    try:
-        if boot_button.value() == 0:  
-            time.sleep(0.1)  # Esperar 100ms para confirmar pulsación
-            if boot_button.value() == 0:  # Si sigue presionado, iniciar conteo
-                print("\nBotón BOOT detectado - Iniciando conteo...")
-                start_time = time.ticks_ms()
-                pressed = True
-                while time.ticks_diff(time.ticks_ms(), start_time) < 3000:
-                    if boot_button.value() == 1:
-                        pressed = False
-                        break
-                    time.sleep_ms(100)
-                
-                if pressed:
-                    print("\n--- RESETEO DE CONFIGURACIÓN ---")
-                    try:
-                        uos.remove(WIFI_FILE)
-                        print(f"Archivo {WIFI_FILE} eliminado")
-                    except OSError as e:
-                        print(f"Error eliminando el archivo: {e}")
-                    
-                    print("Reiniciando dispositivo...\n")
-                    time.sleep(1)
-                    reset()
-                else:
-                    print("Reset cancelado")
-        return False
     except Exception as e:
-        print("Error en check_boot_button:", e)
-        
-# Cargar y guardar intervalo de envío de datos
-def load_interval():
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            interval = int(f.read())
-            print(f"Intervalo de envío de datos configurado en: {interval} segundos")
-            return interval
-    except:
-        print(f"No se pudo cargar el intervalo, usando valor por defecto: {DEFAULT_INTERVAL} segundos")
-        return DEFAULT_INTERVAL
+        node.respond({"co2": "ERROR", "error": str(e)})
+        return
+    print("Comando MH-Z19 enviado:", sent)
 
-# Guardar intervalo de envío de datos
-def save_interval(value):
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            f.write(str(value))
-        print(f"Intervalo guardado: {value} segundos")
-        return True
-    except Exception as e:
-        print(f"Error guardando intervalo: {e}")
-        return False
-
-# Leer sensores y enviar datos por MQTT
-def leer_sensores(new_interval=None):
-    global sensor_interval, timer
-    
-    try:
-        if new_interval is not None and 1 <= new_interval <= 86400:
-            sensor_interval = new_interval
-            save_interval(sensor_interval)
-            timer.deinit()
-            timer.init(period=sensor_interval*1000, mode=Timer.PERIODIC, callback=lambda t: leer_sensores())
-    except Exception as e:
-        print("Error en new_interval:", e)
+    # Confirmar con la respuesta del sensor (null si este modelo no responde)
+    def ack():
+        mhz19.poll()
+        sent["co2"] = "OK"
+        sent["response"] = binascii.hexlify(mhz19.reply).decode() if mhz19.reply_cmd == code else None
+        node.respond(sent)
 
-    try:
-        # Verificación silenciosa de WiFi
-        if not check_wifi_connection():
-            return
-        
-        # Obtener la hora local ajustada por timezone
-        def adjust_time_with_timezone(utc_time, timezone_offset):
-            """Ajusta la hora UTC según el offset de timezone (ej: '-03:00')"""
-            try:
-                # Parsear el offset de timezone
-                sign = -1 if timezone_offset[0] == '-' else 1
-                hours = int(timezone_offset[1:3])
-                minutes = int(timezone_offset[4:6])
-                total_offset = sign * (hours * 3600 + minutes * 60)
-                
-                # Convertir tiempo local a segundos desde epoch
-                epoch_time = time.mktime(utc_time)
-                
-                # Aplicar el offset
-                adjusted_time = epoch_time + total_offset
-                return time.localtime(adjusted_time)
-            except Exception as e:
-                print("Error ajustando zona horaria:", e)
-                return utc_time  # Si hay error, devolver la hora sin ajuste
-        
-        # Se toma la fecha y hora del ESP32 y se ajusta por timezone
-        current_time = time.localtime()
-        adjusted_time = adjust_time_with_timezone(current_time, TIMEZONE)
-        # print("La hora ajustada segun zona horaria es: ", adjusted_time)
-        
-        # Formateamos la fecha y hora
-        year, month, day, hour, minute, second = adjusted_time[:6]
-        fecha_formateada = f"{year}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
-        
-        # Se acceden a los sensores
-        lux = bh1750.luminance(bh1750.CONT_HIRES_1)
-        temp, press, hum = bme280.read_compensated_data()
-        mhz19.get_data()
-               
-        try:
-            sensor_data.update({
-                "sensor_code": config.SENSOR_CODE,
-                "temperature": round(temp, 2),
-                "humidity": round(hum, 2),
-                "atmospheric_pressure": round(press / 100, 2),
-                "luminosity": round(lux, 2),
-                "co2": mhz19.ppm,
-                "datetime": fecha_formateada,
-            })
-        except Exception as e:
-            print("Error en sensor_data.update:", e)
+    node.sched.once(CO2_REPLY_WAIT, ack, "respuesta MH-Z19")
 
-        # Enviar por MQTT si está conectado
-        try:
-            mqtt_client.publish(topic=config.AWS_TOPIC_PUB, msg=json.dumps(sensor_data), qos=0)
-            print("Mensaje publicado: ", json.dumps(sensor_data))
-        except Exception as e:
-            print("Error en cliente MQTT, reconectando...")
-            mqtt_client.connect()
-            mqtt_client.publish(topic=config.AWS_TOPIC_PUB, msg=json.dumps(sensor_data), qos=0)
-            
-        # Liberamos la memoria
-        gc.collect()
-            
-    except Exception as e:
-        print("Error en check_wifi_connection:", e)
+class Environmental(Node):
 
-# Código principal
-try:
-    print("\nIniciando dispositivo...")
-    led.off()  # Comenzar con LED apagado
-    
-    # Intento inicial de conexión WiFi
-    try:
-        if not connect_wifi():
-            print("No se pudo conectar al Wi-Fi en el inicio")
+    def handle_message(self, msg):
+        # Comandos del MH-Z19
+        if "co2" in msg:
+            handle_co2_command(msg["co2"])
         else:
-            # Sincronizar hora si WiFi está conectado
-            if not sync_time():
-                print("Advertencia: No se pudo sincronizar la hora por NTP")
-                
-            # Liberamos la memoria
-            gc.collect()
-            
-            # Conexión al servidor AWS IoT Core
-            print("Intentando conectar a AWS IoT Core...")
-            try:
-                mqtt_client.connect()
-                print("Conectado a AWS IoT Core correctamente")
-                
-                # Suscribirse a topic de MQTT
-                try:
-                    mqtt_client.set_callback(subscription_cb)
-                    mqtt_client.subscribe(config.AWS_TOPIC_SUB)
-                    print(f"Suscrito al tópico: {config.AWS_TOPIC_SUB}")
-                except Exception as e:
-                    print("Error al suscribirse:", e)
-            except Exception as e:
-                print("Error conectando a AWS IoT Core:", e)
-    except Exception as e:
-        print("Error en connect_wifi:", e)
-    # Configuración inicial
-    sensor_interval = load_interval()
-    
-    # Configurar timer y leer sensores y liberar memoria
-    timer = Timer(-1)
-    gc.collect()
-    # Tarea de lectura de sensores
-    timer.init(period=sensor_interval*1000, mode=Timer.PERIODIC, callback=lambda t: leer_sensores())
-    gc.collect()
-        
-    # Bucle principal
-    while True:
-        # Liberamos la memoria
-        gc.collect()
-        try:
-            # Verificación periódica silenciosa
-            check_wifi_connection()
-                        
-            # Verificar botón de reset
-            check_boot_button()
-                
-            # Chequear mensajes MQTT
-            if wifi_connected:
-                try:
-                    mqtt_client.check_msg()
-                except Exception as e:
-                    print("Error en el cliente MQTT:", e)
-            
-            # Pequeño delay para no saturar el procesador
-            time.sleep(0.1)
-            
-        except Exception as e:
-            print("Error crítico:", e)
-            time.sleep(5)
-
-except KeyboardInterrupt:
-    print("\nPrograma detenido por el usuario")
-    try:
-        timer.deinit()
-    except:
-        pass
-    led.off()
-    reset()
-
-except Exception as e:
-    print("Error fatal:", e)
-    sys.print_exception(e)
-    time.sleep(2)
-    reset()
\ No newline at end of file
+            super().handle_message(msg)
+
+# Tabla de drivers del nodo: un sensor con error no impide publicar los
+# demás; el MH-Z19 sólo si se pudo inicializar
+drivers = [
+    ("BME280", read_bme280),
+    ("BH1750", read_bh1750),
+]
+if mhz19:
+    drivers.append(("MH-Z19", read_co2))
+node = Environmental(config, drivers, schema="environmental",
+    aggregate=(b"temperature", b"humidity", b"atmospheric_pressure", b"luminosity"))
+if mhz19:
+    node.every(CO2_POLL_INTERVAL, mhz19.get_data, "co2")
+node.run()
@@ -0,0 +1,4 @@
+# Manifiesto para congelar el firmware común en la imagen de MicroPython:
+#   make BOARD=ESP32_GENERIC FROZEN_MANIFEST=/ruta/a/manifest.py
+include("$(PORT_DIR)/boards/manifest.py")
+package("core")
@@ -3,6 +3,7 @@
 
 from micropython import const
 from machine import Pin
+import time
 
 CMD_CONVERT = const(0x44)
 CMD_RDSCRATCH = const(0xbe)
@@ -11,6 +12,12 @@ CMD_RDPOWER = const(0xb4)
 PULLUP_ON = const(1)
 PULLUP_OFF = const(0)
 
+# Max conversion time (ms) at 9, 10, 11 and 12 bits
+CONVERSION_MS = (94, 188, 375, 750)
+
+# ROMs found on the bus, 8 bytes each (see load_roms)
+ROM_FILE = "roms.dat"
+
 class DS18X20:
     def __init__(self, onewire):
         self.ow = onewire
@@ -18,6 +25,16 @@ class DS18X20:
         self.config = bytearray(3)
         self.power = 1 # strong power supply by default
         self.powerpin = None
+        self.conversion_ms = CONVERSION_MS[3]
+        self.converted_at = None # ticks_ms of the last convert_temp()
+        # ROM registry (see load_roms)
+        self.roms = []
+        self.single = False # exactly one device: Skip ROM instead of Match ROM
+        self.stale = False # rescan before the next reading
+        self.rescan_on_error = True
+        self.rescan_ms = 0 # periodic rescan, 0 = only on errors
+        self.scanned_at = None
+        self.bits = None
 
     def powermode(self, powerpin=None):
         if self.powerpin is not None: # deassert strong pull-up
@@ -36,6 +53,64 @@ class DS18X20:
             self.powerpin(PULLUP_OFF)
         return [rom for rom in self.ow.scan() if rom[0] in (0x10, 0x22, 0x28)]
 
+    def load_roms(self, rescan_on_error=True, rescan_ms=0):
+        """
+        Registry of the devices on the bus, kept on flash: the full ROM
+        search runs only when there is no saved list, when a reading fails
+        its CRC (a probe was unplugged, or a second one plugged in while
+        Skip ROM was in use) or every rescan_ms if set.
+        """
+        self.rescan_on_error = rescan_on_error
+        self.rescan_ms = rescan_ms
+        self.scanned_at = time.ticks_ms()
+        try:
+            with open(ROM_FILE, 'rb') as f:
+                data = f.read()
+            self._set_roms([data[i:i + 8] for i in range(0, len(data) - 7, 8)])
+        except OSError:
+            pass
+        if not self.roms:
+            self.rescan()
+        return self.roms
+
+    def rescan(self):
+        """Search the bus again and save the list if it changed."""
+        roms = [bytes(rom) for rom in self.scan()]
+        self.scanned_at = time.ticks_ms()
+        self.stale = False
+        if roms != self.roms:
+            self._set_roms(roms)
+            if self.bits is not None:
+                for rom in roms:
+                    self.resolution(rom, self.bits)
+            try:
+                with open(ROM_FILE, 'wb') as f:
+                    f.write(b"".join(roms))
+            except OSError:
+                pass
+            return True
+        return False
+
+    def check_rescan(self):
+        """Rescan if a reading failed, the bus was empty or the periodic
+        rescan is due. Returns True if the list of ROMs changed."""
+        if (self.rescan_ms and self.scanned_at is not None and
+                time.ticks_diff(time.ticks_ms(), self.scanned_at) >= self.rescan_ms):
+            self.stale = True
+        return self.rescan() if self.stale or not self.roms else False
+
+    def _set_roms(self, roms):
+        self.roms = roms
+        self.single = len(roms) == 1
+
+    def _select(self, rom):
+        # Reset and address the device: Skip ROM if it is the only one
+        if self.single and rom == self.roms[0]:
+            self.ow.reset()
+            self.ow.writebyte(self.ow.CMD_SKIPROM)
+        else:
+            self.ow.select_rom(rom) # resets the bus too
+
     def convert_temp(self, rom=None):
         if self.powerpin is not None: # deassert strong pull-up
             self.powerpin(PULLUP_OFF)
@@ -45,12 +120,25 @@ class DS18X20:
         else:
             self.ow.select_rom(rom)
         self.ow.writebyte(CMD_CONVERT, self.powerpin)
+        self.converted_at = time.ticks_ms()
+
+    def ready(self):
+        # The conversion started by convert_temp() is done
+        return (self.converted_at is not None and
+                time.ticks_diff(time.ticks_ms(), self.converted_at) >= self.conversion_ms)
+
+    def wait_ready(self):
+        # Sleep only what is left of the conversion
+        if self.converted_at is None:
+            self.convert_temp()
+        left = self.conversion_ms - time.ticks_diff(time.ticks_ms(), self.converted_at)
+        if left > 0:
+            time.sleep_ms(left)
 
     def read_scratch(self, rom):
         if self.powerpin is not None: # deassert strong pull-up
             self.powerpin(PULLUP_OFF)
-        self.ow.reset()
-        self.ow.select_rom(rom)
+        self._select(rom)
         self.ow.writebyte(CMD_RDSCRATCH)
         self.ow.readinto(self.buf)
         assert self.ow.crc8(self.buf) == 0, 'CRC error'
@@ -59,8 +147,7 @@ class DS18X20:
     def write_scratch(self, rom, buf):
         if self.powerpin is not None: # deassert strong pull-up
             self.powerpin(PULLUP_OFF)
-        self.ow.reset()
-        self.ow.select_rom(rom)
+        self._select(rom)
         self.ow.writebyte(CMD_WRSCRATCH)
         self.ow.write(buf)
 
@@ -82,12 +169,18 @@ class DS18X20:
             else:
                 return None
         except AssertionError:
+            # Lost or colliding device: look again before the next reading
+            if self.rescan_on_error:
+                self.stale = True
             return None
 
     def resolution(self, rom, bits=None):
         if bits is not None and 9 <= bits <= 12:
+            self.bits = bits
             self.config[2] = ((bits - 9) << 5) | 0x1f
             self.write_scratch(rom, self.config)
+            if rom[0] != 0x10: # DS18S20 is fixed at 750 ms
+                self.conversion_ms = CONVERSION_MS[bits - 9]
             return bits
         else:
             data = self.read_scratch(rom)
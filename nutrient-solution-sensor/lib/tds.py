@@ -1,33 +1,74 @@
 from machine import ADC, Pin
-import utime
+from array import array
 
 class TDSMeter:
+    # Período de muestreo sugerido para update() en ms (el nodo lo llama
+    # desde el scheduler, ver main.py)
+    SAMPLE_MS = 40
+
     def __init__(self, vref=3.3, scount=30):
         self.vref = vref
         self.scount = scount
         self.adc = ADC(Pin(34))
         self.adc.atten(ADC.ATTN_11DB)  # Para leer hasta 3.3V
         self.adc.width(ADC.WIDTH_12BIT)  # 0-4095 resolución
-        self.buffer = [0] * scount
+        self.buffer = array("H", [0] * scount)  # Muestras en orden de llegada
+        self.window = array("H", [0] * scount)  # Las mismas, ordenadas
         self.index = 0
+        self.count = 0  # Muestras en la ventana (hasta scount)
 
     def update(self):
-        # Tomar una nueva muestra cada 40ms
-        self.buffer[self.index] = self.adc.read()
+        # Tomar una nueva muestra (sin esperas: se llama cada SAMPLE_MS).
+        # La ventana ordenada se mantiene al día reemplazando la muestra
+        # más vieja, así la mediana está siempre lista y no se asigna memoria
+        value = self.adc.read()
+        window = self.window
+        n = self.count
+        if n < self.scount:
+            i = n
+            self.count = n + 1
+        else:
+            # Búsqueda binaria de la muestra que sale de la ventana
+            i = self._find(self.buffer[self.index])
+        self.buffer[self.index] = value
         self.index = (self.index + 1) % self.scount
-        utime.sleep_ms(40)
+        # Correr la nueva muestra hasta su lugar
+        while i > 0 and window[i - 1] > value:
+            window[i] = window[i - 1]
+            i -= 1
+        while i < self.count - 1 and window[i + 1] < value:
+            window[i] = window[i + 1]
+            i += 1
+        window[i] = value
+
+    def _find(self, value):
+        # Posición de value en la ventana ordenada
+        lo = 0
+        hi = self.count - 1
+        window = self.window
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if window[mid] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
 
-    def median(self, values):
-        sorted_vals = sorted(values)
-        mid = len(sorted_vals) // 2
-        if len(sorted_vals) % 2 == 0:
-            return (sorted_vals[mid - 1] + sorted_vals[mid]) // 2
+    def median(self):
+        # Mediana de la ventana, sin ordenar ni copiar el buffer
+        n = self.count
+        if n == 0:
+            self.update()
+            n = 1
+        mid = n // 2
+        if n % 2 == 0:
+            return (self.window[mid - 1] + self.window[mid]) // 2
         else:
-            return sorted_vals[mid]
+            return self.window[mid]
 
     def get_tds(self, temperature=25.0):
         # Calcular voltaje promedio
-        median_adc = self.median(self.buffer)
+        median_adc = self.median()
         voltage = median_adc * self.vref / 4096.0
 
         # Compensación por temperatura
@@ -44,7 +85,7 @@ class TDSMeter:
         return int(tds_value), voltage, median_adc
     
     def get_tds_and_ec(self, temperature=25.0):
-        median_adc = self.median(self.buffer)
+        median_adc = self.median()
         voltage = median_adc * self.vref / 4096.0
 
         compensation_coefficient = 1.0 + 0.02 * (temperature - 25.0)
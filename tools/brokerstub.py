@@ -0,0 +1,161 @@
+"""
+Broker MQTT mínimo para los scripts de tools/ (un hilo por conexión).
+
+Responde CONNECT, SUBSCRIBE, PUBLISH con QoS 1 y PINGREQ, con una demora
+inyectada en cada respuesta (latencia de la red), y puede enviar PUBLISH
+al cliente como si fueran comandos del servidor:
+
+    broker = BrokerStub(latency=0.05)
+    broker.start()
+    ...  # el cliente se conecta a ("127.0.0.1", broker.port)
+    sent_at = broker.send_publish(b"topic", b"{}")
+    broker.stop()
+
+No implementa sesiones, retención ni QoS 2: sólo lo que usan los nodos.
+"""
+import heapq
+import socket
+import struct
+import threading
+import time
+
+
+class BrokerStub:
+    def __init__(self, latency=0.0, answer_pings=True):
+        self.latency = latency  # Demora de cada respuesta (s)
+        self.answer_pings = answer_pings  # False: enlace semiabierto
+        self.published = 0  # PUBLISH recibidos
+        self.pings = 0
+        self.connects = 0
+        self._server = socket.socket()
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(4)
+        self.port = self._server.getsockname()[1]
+        self._conn = None
+        self._lock = threading.Lock()
+        self._queue = []  # (vencimiento, orden, bytes) de las respuestas demoradas
+        self._order = 0
+        self._wake = threading.Condition(self._lock)
+        self._running = False
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._accept, daemon=True).start()
+        threading.Thread(target=self._sender, daemon=True).start()
+
+    def stop(self):
+        self._running = False
+        with self._lock:
+            self._wake.notify()
+        self.drop()
+        self._server.close()
+
+    # Corta la conexión actual (el cliente tiene que reconectar)
+    def drop(self):
+        conn = self._conn
+        self._conn = None
+        if conn is not None:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    # Envía un PUBLISH con QoS 0 al cliente; devuelve el momento del envío
+    def send_publish(self, topic, msg):
+        body = struct.pack("!H", len(topic)) + topic + msg
+        pkt = b"\x30" + _length(len(body)) + body
+        t = time.perf_counter()
+        self._conn.sendall(pkt)
+        return t
+
+    def _reply(self, pkt):
+        with self._lock:
+            self._order += 1
+            heapq.heappush(self._queue, (time.perf_counter() + self.latency, self._order, pkt))
+            self._wake.notify()
+
+    def _sender(self):
+        with self._lock:
+            while self._running:
+                if not self._queue:
+                    self._wake.wait()
+                    continue
+                due = self._queue[0][0] - time.perf_counter()
+                if due > 0:
+                    self._wake.wait(due)
+                    continue
+                pkt = heapq.heappop(self._queue)[2]
+                conn = self._conn
+                if conn is not None:
+                    try:
+                        conn.sendall(pkt)
+                    except OSError:
+                        pass
+
+    def _accept(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.drop()
+            with self._lock:
+                self._queue = []
+            self._conn = conn
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        f = conn.makefile("rb")
+        try:
+            while True:
+                head = f.read(1)
+                if not head:
+                    return
+                n = 0
+                sh = 0
+                while True:
+                    b = f.read(1)[0]
+                    n |= (b & 0x7F) << sh
+                    if not b & 0x80:
+                        break
+                    sh += 7
+                body = f.read(n)
+                self._packet(head[0], body)
+        except (OSError, IndexError, ValueError):
+            pass
+        finally:
+            f.close()
+            conn.close()
+
+    def _packet(self, op, body):
+        t = op & 0xF0
+        if t == 0x10:  # CONNECT
+            self.connects += 1
+            self._reply(b"\x20\x02\x00\x00")
+        elif t == 0x80:  # SUBSCRIBE: SUBACK con QoS 0 para el tema
+            self._reply(b"\x90\x03" + body[:2] + b"\x00")
+        elif t == 0x30:  # PUBLISH
+            self.published += 1
+            if op & 6:
+                topic_len = body[0] << 8 | body[1]
+                pid = body[2 + topic_len:4 + topic_len]
+                self._reply(b"\x40\x02" + pid)
+        elif t == 0xC0:  # PINGREQ
+            self.pings += 1
+            if self.answer_pings:
+                self._reply(b"\xd0\x00")
+
+
+def _length(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
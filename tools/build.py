@@ -0,0 +1,136 @@
+"""
+Compilación de los nodos a bytecode (.mpy) para acelerar el arranque.
+
+Sin compilar, el ESP32 compila en cada arranque core/ y todas las librerías
+de lib/ desde el código fuente. Este script arma en build/<nodo>/ el sistema
+de archivos que se carga en el dispositivo, con core/ y lib/ compilados con
+mpy-cross:
+
+    python tools/build.py                      # todos los nodos
+    python tools/build.py consumption-sensor   # un nodo
+    python tools/build.py --march xtensawin    # permite @micropython.native en ESP32
+
+Con --freeze no compila: genera build/<nodo>/manifest.py para congelar
+core/ y lib/ en la imagen de MicroPython, y deja en build/<nodo>/ sólo los
+archivos que siguen yendo al sistema de archivos:
+
+    python tools/build.py --freeze environmental-sensor
+    make -C ports/esp32 BOARD=ESP32_GENERIC \\
+        FROZEN_MANIFEST=/ruta/a/build/environmental-sensor/manifest.py
+
+main.py y config.py siempre se copian como fuente: MicroPython sólo ejecuta
+main.py desde un .py y config.py se edita en cada dispositivo.
+
+La versión de mpy-cross tiene que coincidir con la del firmware del ESP32.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NODES = ("actuator", "consumption-sensor", "environmental-sensor", "nutrient-solution-sensor")
+SOURCE_FILES = ("main.py", "config.py")
+
+
+# Comando de mpy-cross: el ejecutable o el paquete de pip (pip install mpy-cross)
+def find_mpy_cross():
+    exe = shutil.which("mpy-cross")
+    if exe:
+        return [exe]
+    try:
+        import mpy_cross  # noqa: F401
+        return [sys.executable, "-m", "mpy_cross"]
+    except ImportError:
+        sys.exit("No se encontró mpy-cross (instalar con: pip install mpy-cross)")
+
+
+# Compila src a dst (.mpy); name es la ruta que se ve en los errores
+def compile_file(mpy_cross, src, dst, name, march=None):
+    cmd = mpy_cross + ["-o", dst, "-s", name]
+    if march:
+        cmd.append("-march=" + march)
+    cmd.append(src)
+    subprocess.run(cmd, check=True)
+
+
+# Compila los .py de src_dir en dst_dir, con prefix como ruta en el dispositivo
+def compile_dir(mpy_cross, src_dir, dst_dir, prefix, march=None):
+    os.makedirs(dst_dir, exist_ok=True)
+    count = 0
+    for name in sorted(os.listdir(src_dir)):
+        if not name.endswith(".py"):
+            continue
+        compile_file(mpy_cross, os.path.join(src_dir, name),
+                     os.path.join(dst_dir, name[:-3] + ".mpy"), prefix + name, march)
+        count += 1
+    return count
+
+
+# Copia al directorio de salida todo lo que no es código de lib/
+def copy_node_files(node_dir, out_dir):
+    for name in sorted(os.listdir(node_dir)):
+        src = os.path.join(node_dir, name)
+        if name in ("lib", "readme.md") or name.startswith(".") or name == "__pycache__":
+            continue
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(out_dir, name))
+        elif name.endswith(".py") and name not in SOURCE_FILES:
+            print("  Aviso: se omite", name)
+        else:
+            shutil.copy(src, out_dir)
+
+
+# Manifiesto para congelar core/ y lib/ del nodo en la imagen de MicroPython
+def write_manifest(node_dir, out_dir):
+    path = os.path.join(out_dir, "manifest.py")
+    with open(path, "w") as f:
+        f.write("# Generado por tools/build.py\n")
+        f.write("include({!r})\n".format(os.path.join(ROOT, "manifest.py")))
+        if os.path.isdir(os.path.join(node_dir, "lib")):
+            f.write("package(\"lib\", base_path={!r})\n".format(node_dir))
+    return path
+
+
+def build(node, out_root, freeze=False, march=None, mpy_cross=None):
+    node_dir = os.path.join(ROOT, node)
+    out_dir = os.path.join(out_root, node)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    print("Nodo", node)
+
+    copy_node_files(node_dir, out_dir)
+
+    if freeze:
+        print("  Manifiesto:", write_manifest(node_dir, out_dir))
+        return
+
+    count = compile_dir(mpy_cross, os.path.join(ROOT, "core"),
+                        os.path.join(out_dir, "lib", "core"), "lib/core/", march)
+    lib_dir = os.path.join(node_dir, "lib")
+    if os.path.isdir(lib_dir):
+        count += compile_dir(mpy_cross, lib_dir, os.path.join(out_dir, "lib"), "lib/", march)
+    print("  Módulos compilados:", count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila los nodos a .mpy o genera su manifiesto para congelarlos.")
+    parser.add_argument("nodes", nargs="*", metavar="nodo",
+                        help="nodos a compilar (por defecto todos): " + ", ".join(NODES))
+    parser.add_argument("--out", default=os.path.join(ROOT, "build"), help="directorio de salida")
+    parser.add_argument("--freeze", action="store_true", help="generar manifest.py en lugar de compilar")
+    parser.add_argument("--march", help="arquitectura para código nativo (ej: xtensawin)")
+    args = parser.parse_args()
+    for node in args.nodes:
+        if node not in NODES:
+            parser.error("nodo desconocido: " + node)
+
+    mpy_cross = None if args.freeze else find_mpy_cross()
+    for node in args.nodes or NODES:
+        build(node, os.path.abspath(args.out), args.freeze, args.march, mpy_cross)
+
+
+if __name__ == "__main__":
+    main()
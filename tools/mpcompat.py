@@ -0,0 +1,172 @@
+"""
+APIs de MicroPython sobre CPython, para correr core/ en la PC desde los
+scripts de tools/ (benchmarks y pruebas contra un broker local).
+
+    import mpcompat
+    mpcompat.install()
+    from core import asyncmqtt
+    mpcompat.patch_socket(asyncmqtt)
+
+install() agrega a time las funciones ticks_* y sleep_ms/sleep_us, y a
+asyncio sleep_ms, wait_for_ms y StreamReader(sock). patch_socket()
+reemplaza el módulo socket de un módulo de core/ por uno cuyos sockets
+tienen read/write/readinto como los de MicroPython. Son sockets reales: no
+simula la red.
+"""
+import asyncio
+import os
+import socket as _socket
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_T0 = time.perf_counter()
+
+
+def ticks_ms():
+    return int((time.perf_counter() - _T0) * 1000)
+
+
+def ticks_us():
+    return int((time.perf_counter() - _T0) * 1000000)
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+
+def ticks_diff(a, b):
+    return a - b
+
+
+def sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
+
+
+async def _sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+
+async def _wait_for_ms(aw, timeout):
+    return await asyncio.wait_for(aw, timeout / 1000)
+
+
+class StreamReader:
+    """asyncio.StreamReader(sock) de MicroPython: espera que el socket
+    tenga datos y los lee con readinto()."""
+
+    CLOSE_CHECK = 0.05  # Un socket cerrado mientras se espera se detecta en este tiempo (s)
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    async def readinto(self, buf):
+        raw = self.sock.raw
+        loop = asyncio.get_running_loop()
+        while True:
+            if raw.fileno() < 0:
+                raise OSError(9)  # EBADF
+            try:
+                return raw.recv_into(buf)
+            except BlockingIOError:
+                pass
+            fd = raw.fileno()
+            ready = loop.create_future()
+            loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+            try:
+                await asyncio.wait_for(ready, self.CLOSE_CHECK)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                loop.remove_reader(fd)
+
+
+class Socket:
+    """Socket TCP con la interfaz de stream de MicroPython."""
+
+    def __init__(self, raw=None):
+        self.raw = raw or _socket.socket()
+        self.raw.setsockopt(_socket.IPPROTO_TCP, _socket.TCP_NODELAY, 1)
+        self._blocking = True
+
+    def settimeout(self, timeout):
+        self.raw.settimeout(timeout)
+        self._blocking = timeout != 0
+
+    def setblocking(self, flag):
+        self.raw.setblocking(flag)
+        self._blocking = flag
+
+    def connect(self, addr):
+        self.raw.connect(addr)
+
+    def fileno(self):
+        return self.raw.fileno()
+
+    def close(self):
+        self.raw.close()
+
+    def write(self, buf, n=None):
+        if isinstance(buf, str):
+            buf = buf.encode()
+        data = memoryview(buf)
+        if n is not None:
+            data = data[:n]
+        if self._blocking:
+            self.raw.sendall(data)
+            return len(data)
+        try:
+            return self.raw.send(data)
+        except BlockingIOError:
+            return None
+
+    # Como en MicroPython: bloqueante, hasta n bytes o el fin de la conexión;
+    # no bloqueante, lo que haya (None si no hay nada)
+    def read(self, n):
+        if not self._blocking:
+            try:
+                return self.raw.recv(n)
+            except BlockingIOError:
+                return None
+        data = b""
+        while len(data) < n:
+            chunk = self.raw.recv(n - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def readinto(self, buf, n=None):
+        try:
+            return self.raw.recv_into(buf, n or 0)
+        except BlockingIOError:
+            return None
+
+
+class _SocketModule:
+    AF_INET = _socket.AF_INET
+    SOCK_STREAM = _socket.SOCK_STREAM
+    getaddrinfo = staticmethod(_socket.getaddrinfo)
+
+    @staticmethod
+    def socket(*args):
+        return Socket(_socket.socket(*args))
+
+
+def install():
+    for name in ("ticks_ms", "ticks_us", "ticks_add", "ticks_diff", "sleep_ms", "sleep_us"):
+        setattr(time, name, globals()[name])
+    asyncio.sleep_ms = _sleep_ms
+    asyncio.wait_for_ms = _wait_for_ms
+    asyncio.StreamReader = StreamReader
+
+
+def patch_socket(module):
+    module.socket = _SocketModule
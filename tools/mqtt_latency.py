@@ -0,0 +1,120 @@
+"""
+Latencia comando -> callback del cliente MQTT asíncrono (core/asyncmqtt.py)
+frente al sondeo con check_msg() cada 100 ms que hacían los main.py.
+
+Corre en la PC (CPython) contra un broker local (tools/brokerstub.py): el
+broker envía comandos separados entre 150 y 400 ms al azar y se mide el
+tiempo hasta que llegan al callback de suscripción.
+
+    python tools/mqtt_latency.py
+    python tools/mqtt_latency.py --count 100 --poll-ms 100
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import mpcompat
+
+mpcompat.install()
+
+from brokerstub import BrokerStub  # noqa: E402
+from core import asyncmqtt, simple  # noqa: E402
+
+mpcompat.patch_socket(simple)
+mpcompat.patch_socket(asyncmqtt)
+
+TOPIC = b"cmd"
+
+
+# Envía `count` comandos desde otro hilo; sent[i] es el momento del envío
+def send_commands(broker, count, sent, gap_ms):
+    for i in range(count):
+        time.sleep(random.uniform(gap_ms[0], gap_ms[1]) / 1000)
+        sent[i] = broker.send_publish(TOPIC, str(i).encode())
+
+
+def summary(name, latencies):
+    ms = sorted(x * 1000 for x in latencies)
+    n = len(ms)
+    print("{:<28} n={:<4} media={:7.2f} ms  p50={:7.2f} ms  p95={:7.2f} ms  max={:7.2f} ms".format(
+        name, n, sum(ms) / n, ms[n // 2], ms[min(n - 1, n * 95 // 100)], ms[-1]))
+
+
+async def event_driven(port, count):
+    broker_sent = [None] * count
+    latencies = []
+    done = asyncio.Event()
+
+    def cb(topic, msg):
+        latencies.append(time.perf_counter() - broker_sent[int(msg)])
+        if len(latencies) == count:
+            done.set()
+
+    client = asyncmqtt.MQTTClient("latency", "127.0.0.1", port=port, keepalive=60)
+    client.set_callback(cb)
+    client.add_subscription(TOPIC)
+    task = asyncio.create_task(client.run())
+    while not client.is_connected():
+        await asyncio.sleep(0.01)
+    return client, task, broker_sent, latencies, done
+
+
+def polling(port, sent):
+    latencies = []
+
+    def cb(topic, msg):
+        latencies.append(time.perf_counter() - sent[int(msg)])
+
+    client = simple.MQTTClient("latency-poll", "127.0.0.1", port=port)
+    client.set_callback(cb)
+    client.connect()
+    client.subscribe(TOPIC)
+    return client, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia comando -> callback del cliente MQTT.")
+    parser.add_argument("--count", type=int, default=50, help="comandos por prueba")
+    parser.add_argument("--poll-ms", type=int, default=100, help="período de check_msg() del sondeo")
+    parser.add_argument("--gap-ms", type=int, nargs=2, default=(150, 400), metavar=("MIN", "MAX"),
+                        help="separación al azar entre comandos")
+    args = parser.parse_args()
+    gap_ms = args.gap_ms
+
+    broker = BrokerStub()
+    broker.start()
+
+    # Cliente asíncrono: el callback corre en cuanto llega el paquete
+    async def run_event():
+        client, task, sent, latencies, done = await event_driven(broker.port, args.count)
+        sender = threading.Thread(target=send_commands, args=(broker, args.count, sent, gap_ms))
+        sender.start()
+        await asyncio.wait_for(done.wait(), args.count)
+        sender.join()
+        task.cancel()
+        client._close()
+        return latencies
+
+    summary("asyncmqtt (eventos)", asyncio.run(run_event()))
+
+    # Sondeo: check_msg() cada poll_ms, como el bucle principal anterior
+    sent = [None] * args.count
+    client, latencies = polling(broker.port, sent)
+    sender = threading.Thread(target=send_commands, args=(broker, args.count, sent, gap_ms))
+    sender.start()
+    polls = 0
+    while len(latencies) < args.count:
+        client.check_msg()
+        polls += 1
+        time.sleep(args.poll_ms / 1000)
+    sender.join()
+    client.sock.close()
+    summary("check_msg() cada {} ms".format(args.poll_ms), latencies)
+    print("Sondeos del socket con check_msg():", polls)
+    broker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Rendimiento de la publicación con QoS 1 de core/simple.py: una confirmación
+por mensaje (window=0, un viaje de ida y vuelta por lectura) frente a la
+ventana de mensajes sin confirmar (window=N).
+
+Corre en la PC (CPython) contra un broker local (tools/brokerstub.py) que
+demora cada PUBACK la latencia indicada, como un enlace Wi-Fi + Internet:
+
+    python tools/mqtt_throughput.py
+    python tools/mqtt_throughput.py --latency 50 --count 200 --size 300
+"""
+import argparse
+import time
+
+import mpcompat
+
+mpcompat.install()
+
+from brokerstub import BrokerStub  # noqa: E402
+from core import simple  # noqa: E402
+
+mpcompat.patch_socket(simple)
+
+
+# Publica `count` mensajes con QoS 1 y espera todas las confirmaciones
+def run(port, window, count, msg):
+    client = simple.MQTTClient("throughput", "127.0.0.1", port=port, window=window)
+    client.connect()
+    start = time.perf_counter()
+    for _ in range(count):
+        client.publish(b"readings", msg, qos=1)
+    client.flush()
+    elapsed = time.perf_counter() - start
+    client.disconnect()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento de QoS 1 con y sin ventana.")
+    parser.add_argument("--latency", type=float, default=50, help="demora de cada respuesta del broker (ms)")
+    parser.add_argument("--count", type=int, default=200, help="mensajes por prueba")
+    parser.add_argument("--size", type=int, default=300, help="bytes por mensaje")
+    parser.add_argument("--windows", type=int, nargs="+", default=(0, 4, 16), help="ventanas a medir")
+    args = parser.parse_args()
+
+    broker = BrokerStub(latency=args.latency / 1000)
+    broker.start()
+    msg = b"x" * args.size
+    print("{} mensajes de {} bytes, latencia {:g} ms".format(args.count, args.size, args.latency))
+    base = None
+    for window in args.windows:
+        published = broker.published
+        elapsed = run(broker.port, window, args.count, msg)
+        rate = args.count / elapsed
+        base = base or rate
+        print("window={:<3} {:7.2f} s  {:8.1f} mensajes/s  x{:.1f}  (recibidos {})".format(
+            window, elapsed, rate, rate / base, broker.published - published))
+    broker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Codificación de una lectura con core/payload.py frente a lo que hacían los
+main.py: diccionario con round() en cada campo y json.dumps().
+
+Corre en la PC (CPython). Para cada forma de mensaje de los nodos (los
+campos que escriben sus drivers, tomados de core/schemas.py sin las
+estadísticas del muestreo rápido) mide el tiempo de codificación y la
+memoria temporal por mensaje (pico de tracemalloc durante una codificación):
+
+    python tools/payload_bench.py
+    python tools/payload_bench.py --count 20000
+
+En CPython json.dumps está escrito en C y Payload en Python, así que la
+comparación de tiempos favorece a json.dumps; en el ESP32 lo que importa
+es la memoria temporal, que es la que fragmenta el heap y dispara el gc.
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+import mpcompat  # noqa: F401  (agrega la raíz del repositorio a sys.path)
+
+from core.payload import Payload  # noqa: E402
+from core.schemas import SCHEMAS  # noqa: E402
+
+CODE = "ABC-123"
+DATETIME = b"2026-10-18 10:00:00"
+STATS = (b"_min", b"_max", b"_std")
+BUF_SIZE = 1024  # Holgado: aquí se mide la codificación, no el tamaño del buffer del nodo
+
+
+# Campos de los drivers de un esquema con un valor representativo cada uno
+def shape(fields, seed):
+    rng = random.Random(seed)
+    out = []
+    for key, fmt, decimals in fields:
+        key = key.encode()
+        if key == b"samples" or key.endswith(STATS):
+            continue
+        value = rng.uniform(0, 1000) if decimals else rng.randint(0, 255)
+        out.append((key, value, decimals))
+    return out
+
+
+def encode_payload(p, fields):
+    p.begin()
+    for key, value, decimals in fields:
+        p.num(key, value, decimals)
+    p.text(b"datetime", DATETIME)
+    return p.view()
+
+
+def encode_dumps(code_key, fields):
+    data = {code_key: CODE}
+    for key, value, decimals in fields:
+        data[key.decode()] = round(value, decimals) if decimals else value
+    data["datetime"] = DATETIME.decode()
+    return json.dumps(data).encode()
+
+
+# Segundos por mensaje
+def timing(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count
+
+
+# Memoria temporal de una codificación (bytes) y tamaño del mensaje
+def peak(fn):
+    fn()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    msg = fn()
+    used = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return used, len(msg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload frente a json.dumps por forma de mensaje.")
+    parser.add_argument("--count", type=int, default=5000, help="codificaciones por medición")
+    args = parser.parse_args()
+
+    print("{:<18} {:>6} {:>10} {:>10} {:>7} {:>10} {:>10}".format(
+        "esquema", "bytes", "Payload", "dumps", "dumps/P", "mem P.", "mem dumps"))
+    for sid, (name, code_key, fields) in sorted(SCHEMAS.items()):
+        values = shape(fields, sid)
+        p = Payload({code_key: CODE}, BUF_SIZE)
+        fast = lambda: encode_payload(p, values)  # noqa: E731
+        slow = lambda: encode_dumps(code_key, values)  # noqa: E731
+        t_fast = timing(fast, args.count)
+        t_slow = timing(slow, args.count)
+        mem_fast, size = peak(fast)
+        mem_slow, _ = peak(slow)
+        print("{:<18} {:>6} {:>8.1f}us {:>8.1f}us {:>6.1f}x {:>9}B {:>9}B".format(
+            name, size, t_fast * 1e6, t_slow * 1e6, t_slow / t_fast, mem_fast, mem_slow))
+
+
+if __name__ == "__main__":
+    main()
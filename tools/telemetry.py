@@ -0,0 +1,96 @@
+"""
+Decodificador de la telemetría binaria de los nodos (CPython).
+
+Convierte un mensaje publicado en AWS_TOPIC_PUB_BIN en el mismo diccionario
+que el nodo publica en JSON por AWS_TOPIC_PUB:
+
+    from telemetry import decode
+    data = decode(payload)              # "datetime": "AAAA-MM-DD hh:mm:ss"
+    data = decode(payload, epoch=True)  # "datetime": segundos desde 1970
+
+También se puede usar desde la línea de comandos con el mensaje en un
+archivo (o en la entrada estándar):
+
+    python tools/telemetry.py mensaje.bin
+    python tools/telemetry.py --hex 0102...
+
+Los esquemas se leen de core/schemas.py, el mismo módulo que usan los nodos.
+"""
+import argparse
+import datetime
+import json
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.schemas import SCHEMAS, VERSION, HEADER, HEADER_SIZE, SIZES  # noqa: E402
+
+
+class DecodeError(ValueError):
+    pass
+
+
+def decode(payload, epoch=False):
+    payload = bytes(payload)
+    if len(payload) < HEADER_SIZE + 1:
+        raise DecodeError("Mensaje demasiado corto")
+    version, sid, tz, timestamp, mask, nulls = struct.unpack_from(HEADER, payload, 0)
+    if version != VERSION:
+        raise DecodeError("Versión de formato no soportada: {}".format(version))
+    if sid not in SCHEMAS:
+        raise DecodeError("Esquema desconocido: {}".format(sid))
+    name, code_key, fields = SCHEMAS[sid]
+
+    code_len = payload[HEADER_SIZE]
+    offset = HEADER_SIZE + 1 + code_len
+    if len(payload) < offset:
+        raise DecodeError("Código del nodo incompleto")
+    data = {code_key: payload[HEADER_SIZE + 1:offset].decode()}
+
+    # Un mensaje de un firmware anterior puede traer menos campos
+    for bit, (key, fmt, decimals) in enumerate(fields):
+        size = SIZES[fmt]
+        if offset + size > len(payload):
+            break
+        if nulls & (1 << bit):
+            data[key] = None
+        elif mask & (1 << bit):
+            (value,) = struct.unpack_from("<" + fmt, payload, offset)
+            data[key] = round(value / 10 ** decimals, decimals) if decimals else value
+        offset += size
+
+    if epoch:
+        data["datetime"] = timestamp
+    else:
+        local = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+        local += datetime.timedelta(minutes=tz)
+        data["datetime"] = local.strftime("%Y-%m-%d %H:%M:%S")
+    return data
+
+
+# Nombre del esquema de un mensaje (ej: "consumption")
+def schema_name(payload):
+    return SCHEMAS[payload[1]][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decodifica un mensaje de telemetría binaria a JSON.")
+    parser.add_argument("file", nargs="?", help="archivo con el mensaje (por defecto la entrada estándar)")
+    parser.add_argument("--hex", help="mensaje en hexadecimal")
+    parser.add_argument("--epoch", action="store_true", help="datetime en segundos desde 1970")
+    args = parser.parse_args()
+
+    if args.hex:
+        payload = bytes.fromhex(args.hex)
+    elif args.file:
+        with open(args.file, "rb") as f:
+            payload = f.read()
+    else:
+        payload = sys.stdin.buffer.read()
+    print(json.dumps(decode(payload, args.epoch)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Pruebas en la PC (CPython) de las tramas que arma el driver del MH-Z19
+(environmental-sensor/lib/mhz19.py), con un UART falso que guarda lo
+escrito:
+
+    python tools/test_mhz19.py
+    python -m pytest tools/test_mhz19.py
+
+Cubre la suma de verificación de todos los comandos de calibración de
+span admitidos (1000 a 10000 ppm): con una suma de bytes múltiplo de 256
+el checksum tiene que ser 0.
+"""
+import os
+import sys
+import types
+
+import mpcompat
+
+mpcompat.install()
+
+sys.path.insert(0, os.path.join(mpcompat.ROOT, "environmental-sensor"))
+
+
+class FakeUART:
+    def __init__(self, *args, **kwargs):
+        self.tx = []
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def any(self):
+        return 0
+
+    def write(self, data):
+        self.tx.append(bytes(data))
+
+
+if "machine" not in sys.modules:
+    sys.modules["machine"] = types.ModuleType("machine")
+sys.modules["machine"].UART = FakeUART
+
+from lib import mhz19  # noqa: E402
+
+
+# Trama válida: cabecera, largo 9 y bytes 1 a 8 que suman 0 (módulo 256)
+def check_frame(frame):
+    assert len(frame) == 9
+    assert frame[0] == 0xFF
+    assert sum(frame[1:9]) % 256 == 0, frame.hex()
+
+
+def test_read_cmd():
+    sensor = mhz19.MHZ19(2)
+    assert sensor.crc8(mhz19.READ_CMD) == mhz19.READ_CMD[8] == 0x79
+    check_frame(mhz19.READ_CMD)
+
+
+def test_span_calibration_range():
+    sensor = mhz19.MHZ19(2)
+    zero_sums = 0
+    for ppm in range(1000, 10001):
+        sensor.span_calibration(ppm)
+        frame = sensor.uart.tx[-1]
+        check_frame(frame)
+        assert frame[2] == mhz19.CMD_SPAN and frame[3] << 8 | frame[4] == ppm
+        if frame[8] == 0:
+            zero_sums += 1
+    # 1139, 1394, 1649... tienen suma múltiplo de 256
+    assert zero_sums == 35
+
+
+def test_other_commands():
+    sensor = mhz19.MHZ19(2)
+    sensor.set_abc(True)
+    sensor.set_abc(False)
+    for ppm in mhz19.RANGES:
+        sensor.set_range(ppm)
+    sensor.zero_calibration()
+    for frame in sensor.uart.tx:
+        check_frame(frame)
+
+
+def main():
+    for name, test in sorted(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print("OK", name)
+
+
+if __name__ == "__main__":
+    main()